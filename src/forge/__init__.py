@@ -1,4 +1,12 @@
-from . import storage  # re-export for tests
+import importlib
+
+
+def __getattr__(name: str):
+    # Lazy re-exports for tests; importing forge must stay cheap for CLI startup
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     "cli",
@@ -1,16 +1,38 @@
 from __future__ import annotations
 import asyncio
+import hashlib
 import logging
-from typing import Any
+from typing import Any, Callable, Optional
 from pathlib import Path
+from .memory import MemoryStore
 from .providers import BaseProvider
 
+# Cap on remembered context injected into the system prompt
+MEMORY_CONTEXT_CHARS = 2000
+
 
 class Agent:
-    def __init__(self, id: int, provider: BaseProvider, system_prompt: str | None = None):
+    def __init__(
+        self,
+        id: int,
+        provider: BaseProvider,
+        system_prompt: str | None = None,
+        on_output: Optional[Callable[[str], None]] = None,
+        memory: Optional[MemoryStore] = None,
+        memory_namespace: str = "default/forge",
+        memory_context: int = 3,
+        reuse_output: bool = False,
+    ):
         self.id = id
         self.provider = provider
         self.prompt = system_prompt or ""
+        # Called with each output chunk as it streams in; enables provider streaming
+        self.on_output = on_output
+        self.memory = memory
+        self.memory_namespace = memory_namespace
+        self.memory_context = memory_context
+        # Replay remembered output for an identical payload instead of calling the model
+        self.reuse_output = reuse_output
         self.state = "idle"
         self._logger = logging.getLogger(f"agent-{self.id}")
         # File logger per agent
@@ -26,8 +48,16 @@ class Agent:
         self._logger.info("starting task")
         try:
             self.state = "running"
+            recalled = await self._recall(task_payload)
+            if recalled is not None:
+                self.state = "idle"
+                self._logger.info("task complete (reused remembered output)")
+                if self.on_output is not None:
+                    self.on_output(recalled)
+                return {"agent": self.id, "output": recalled, "from_memory": True}
             result_text = await self._execute(task_payload)
             await self._verify(task_payload, result_text)
+            await self._remember(task_payload, result_text)
             self.state = "idle"
             self._logger.info("task complete")
             return {"agent": self.id, "output": result_text}
@@ -39,7 +69,43 @@ class Agent:
 
     async def _execute(self, task_payload: str) -> str:
         # Single-call generate; retries should be handled by caller/queue runner if needed
-        return await self.provider.generate(self.prompt, task_payload)
+        system_prompt = await self._system_prompt(task_payload)
+        if self.on_output is None:
+            return await self.provider.generate(system_prompt, task_payload)
+        chunks: list[str] = []
+        async for chunk in self.provider.stream(system_prompt, task_payload):
+            chunks.append(chunk)
+            self.on_output(chunk)
+        return "".join(chunks)
+
+    @staticmethod
+    def _memory_key(task_payload: str) -> str:
+        return "task:" + hashlib.sha256(task_payload.encode()).hexdigest()[:32]
+
+    async def _recall(self, task_payload: str) -> Optional[str]:
+        # An identical task already answered in this namespace needs no model call
+        if self.memory is None or not self.reuse_output:
+            return None
+        return await self.memory.get(self.memory_namespace, self._memory_key(task_payload))
+
+    async def _remember(self, task_payload: str, output: str) -> None:
+        if self.memory is None:
+            return
+        try:
+            await self.memory.set(self.memory_namespace, self._memory_key(task_payload), output, topic=task_payload)
+        except Exception:
+            # The output is already paid for and verified; a lost memory entry must not fail the task
+            self._logger.exception("failed to store task output in memory")
+
+    async def _system_prompt(self, task_payload: str) -> str:
+        if self.memory is None or self.memory_context <= 0:
+            return self.prompt
+        entries = await self.memory.relevant(self.memory_namespace, task_payload, self.memory_context)
+        if not entries:
+            return self.prompt
+        budget = MEMORY_CONTEXT_CHARS // len(entries)
+        notes = "\n\n".join(value[:budget] for _, value in entries)
+        return f"{self.prompt}\n\nRelevant results from earlier tasks:\n{notes}".strip()
 
     async def _verify(self, task_payload: str, output: str) -> None:
         # Logical verification: non-empty output
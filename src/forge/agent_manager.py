@@ -1,10 +1,16 @@
 from __future__ import annotations
 import asyncio
 import logging
-from typing import Sequence, Optional
+from dataclasses import dataclass
+from typing import Any, Sequence, Optional
 from .agent import Agent
+from .dag import ORPHAN_JOIN_SECONDS, join_prompt
+from .config import load_config, watch_config as _watch_config
+from .memory import MemoryStore
+from .queue import TaskQueue, prefetch as prefetch_tasks
 from .providers import BaseProvider
-from . import storage
+from .events import TaskEvent, bus, preview
+from . import storage, usage
 
 
 class AgentPool:
@@ -18,7 +24,74 @@ class AgentPool:
         return await asyncio.gather(*coros, return_exceptions=True)
 
 
-async def run_queue(concurrency: int, provider: BaseProvider, retries: int = 0, continuous: bool = False) -> None:
+class RateLimiter:
+    """Spaces provider calls to at most ``rate`` per second across all workers (0 = unlimited)."""
+
+    def __init__(self, rate: float = 0.0):
+        self.rate = rate
+        self._next_slot = 0.0
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + 1.0 / self.rate
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+@dataclass
+class RunnerSettings:
+    """Knobs a running queue re-reads on every task, so config edits apply live."""
+
+    concurrency: int
+    retries: int = 0
+    retry_delay: float = 1.0
+    rate_limit: float = 0.0
+
+    def apply_config(self, old: dict[str, Any], new: dict[str, Any]) -> list[str]:
+        """Adopt config values that changed between ``old`` and ``new``.
+
+        Only changed keys are applied, so CLI overrides survive unrelated edits.
+        Returns the names of the settings that changed.
+        """
+        changed = []
+        if new.get("concurrency_limit") != old.get("concurrency_limit") and new.get("concurrency_limit"):
+            self.concurrency = max(1, int(new["concurrency_limit"]))
+            changed.append("concurrency")
+        old_retry, new_retry = old.get("retry_policy") or {}, new.get("retry_policy") or {}
+        if new_retry.get("max_retries") != old_retry.get("max_retries") and new_retry.get("max_retries") is not None:
+            self.retries = int(new_retry["max_retries"])
+            changed.append("retries")
+        if new_retry.get("delay_seconds") != old_retry.get("delay_seconds") and new_retry.get("delay_seconds") is not None:
+            self.retry_delay = float(new_retry["delay_seconds"])
+            changed.append("retry_delay")
+        if new.get("rate_limit") != old.get("rate_limit"):
+            self.rate_limit = float(new.get("rate_limit") or 0)
+            changed.append("rate_limit")
+        return changed
+
+
+async def run_queue(
+    concurrency: int,
+    provider: BaseProvider,
+    retries: int = 0,
+    continuous: bool = False,
+    stream_output: bool = False,
+    retry_delay: float = 1.0,
+    rate_limit: float = 0.0,
+    watch_config: bool = False,
+    memory: Optional[MemoryStore] = None,
+    memory_namespace: str = "default/forge",
+    memory_context: int = 3,
+    memory_reuse: bool = False,
+    prefetch: Optional[int] = None,
+    metrics_interval: float = 10.0,
+    budget: Optional[usage.BudgetGuard] = None,
+    prices: Optional[dict[str, dict[str, float]]] = None,
+) -> None:
     logger = logging.getLogger("runner")
     # System log file
     from pathlib import Path
@@ -30,33 +103,153 @@ async def run_queue(concurrency: int, provider: BaseProvider, retries: int = 0,
         logger.setLevel(logging.INFO)
         logger.addHandler(fh)
     await storage.init_db()
+    if memory is not None:
+        await memory.init()
+    abandoned = await storage.sweep_orphaned_joins(ORPHAN_JOIN_SECONDS)
+    if abandoned:
+        logger.warning("failed %s tasks under joins that were never sealed", abandoned)
+
+    settings = RunnerSettings(concurrency, retries, retry_delay, rate_limit)
+    limiter = RateLimiter(rate_limit)
+    workers: dict[int, asyncio.Task] = {}
+    # Workers blocked on an empty buffer; safe to cancel when scaling down
+    waiting: set[int] = set()
+    buffer = TaskQueue(prefetch if prefetch is not None else min(concurrency, 64))
+
+    def publish_output(worker_id: int, task_id: int):
+        return lambda chunk: bus.publish(TaskEvent("output", task_id=task_id, worker_id=worker_id, text=chunk))
+
+    async def run_attempt(agent: Agent, task_id: int, payload: str) -> Optional[str]:
+        await limiter.acquire()
+        if budget is not None:
+            await budget.acquire()
+        records: list[usage.Usage] = []
+        try:
+            with usage.recording() as rec:
+                records = rec.records
+                result = await agent.run_task(payload)
+                return result.get("output")
+        finally:
+            # Failed attempts cost tokens too, so account for every call made
+            if budget is not None:
+                budget.release(records, prices)
+            if records:
+                try:
+                    await storage.record_usage(
+                        task_id,
+                        [
+                            (u.model, u.input_tokens, u.output_tokens, u.cache_read_tokens,
+                             u.cache_creation_tokens, u.latency_ms, u.cost(prices))
+                            for u in records
+                        ],
+                    )
+                except Exception:
+                    # Losing a usage row beats retrying (and paying for) a call that succeeded
+                    logger.exception("failed to record usage for task %s", task_id)
 
     async def worker(worker_id: int):
-        idle_streak = 0
-        while True:
-            item = await storage.acquire_next_task()
-            if not item:
-                if not continuous:
-                    return
-                idle_streak += 1
-                await asyncio.sleep(min(1.0 * (1 + idle_streak // 10), 5.0))
-                continue
-            idle_streak = 0
-            task_id, payload = item
-            agent = Agent(worker_id, provider)
-            attempt = 0
-            while True:
+        bus.publish(TaskEvent("worker", worker_id=worker_id, status="idle"))
+        try:
+            # Workers above the current concurrency retire between tasks, never mid-task
+            while worker_id < settings.concurrency:
+                waiting.add(worker_id)
                 try:
-                    await agent.run_task(payload)
-                    await storage.complete_task(task_id)
-                    break
-                except Exception as e:
-                    attempt += 1
-                    logger.warning("task %s failed (attempt %s/%s): %s", task_id, attempt, retries + 1, e)
-                    if attempt > retries:
-                        await storage.fail_task(task_id)
+                    item = await buffer.get()
+                finally:
+                    waiting.discard(worker_id)
+                if item is None:
+                    return
+                task_id, payload, schedule_id, is_join = item
+                if is_join:
+                    # A join task runs over its children's results
+                    payload = join_prompt(payload, await storage.child_outputs(task_id))
+                bus.publish(TaskEvent("task", task_id=task_id, worker_id=worker_id, status="in_progress", text=preview(payload)))
+                bus.publish(TaskEvent("worker", task_id=task_id, worker_id=worker_id, status="running"))
+                on_output = publish_output(worker_id, task_id) if stream_output else None
+                agent = Agent(
+                    worker_id,
+                    provider,
+                    on_output=on_output,
+                    memory=memory,
+                    memory_namespace=memory_namespace,
+                    memory_context=memory_context,
+                    # A recurring job must run every time, not replay its first answer
+                    reuse_output=memory_reuse and schedule_id is None,
+                )
+                attempt = 0
+                while True:
+                    try:
+                        output = await run_attempt(agent, task_id, payload)
+                        await storage.complete_task(task_id, output)
+                        bus.publish(TaskEvent("task", task_id=task_id, worker_id=worker_id, status="done"))
                         break
-                    await asyncio.sleep(1.0 * attempt)
+                    except Exception as e:
+                        attempt += 1
+                        logger.warning("task %s failed (attempt %s/%s): %s", task_id, attempt, settings.retries + 1, e)
+                        if attempt > settings.retries:
+                            await storage.fail_task(task_id)
+                            bus.publish(TaskEvent("task", task_id=task_id, worker_id=worker_id, status="failed", text=str(e)))
+                            break
+                        bus.publish(TaskEvent("task", task_id=task_id, worker_id=worker_id, status="retrying", text=str(e)))
+                        await asyncio.sleep(settings.retry_delay * attempt)
+                buffer.task_done()
+                bus.publish(TaskEvent("worker", worker_id=worker_id, status="idle"))
+        finally:
+            bus.publish(TaskEvent("worker", worker_id=worker_id, status="stopped"))
+
+    def scale() -> None:
+        for i in range(settings.concurrency):
+            if i not in workers or workers[i].done():
+                workers[i] = asyncio.create_task(worker(i))
+        for i in list(waiting):
+            if i >= settings.concurrency:
+                workers[i].cancel()
+
+    async def report_metrics() -> None:
+        while True:
+            await asyncio.sleep(metrics_interval)
+            m = buffer.metrics()
+            logger.info(
+                "buffer depth=%s/%s fill=%.0f%% item_wait=%.1fms worker_wait=%.1fms",
+                m["depth"], m["maxsize"], 100 * m["fill_ratio"], m["item_wait_ms_avg"], m["consumer_wait_ms_avg"],
+            )
+            bus.publish(TaskEvent("queue", data=m))
+
+    watcher: Optional[asyncio.Task] = None
+    if watch_config:
+        current = {"cfg": load_config()}
+
+        def on_config_change(cfg: dict[str, Any]) -> None:
+            changed = settings.apply_config(current["cfg"], cfg)
+            current["cfg"] = cfg
+            if not changed:
+                return
+            limiter.rate = settings.rate_limit
+            logger.info(
+                "config reloaded (%s): concurrency=%s retries=%s retry_delay=%s rate_limit=%s",
+                ", ".join(changed), settings.concurrency, settings.retries, settings.retry_delay, settings.rate_limit,
+            )
+            scale()
+
+        watcher = asyncio.create_task(_watch_config(on_config_change))
 
-    tasks = [asyncio.create_task(worker(i)) for i in range(concurrency)]
-    await asyncio.gather(*tasks)
+    fetcher = asyncio.create_task(prefetch_tasks(buffer, continuous))
+    reporter = asyncio.create_task(report_metrics())
+    scale()
+    try:
+        while workers:
+            done, _ = await asyncio.wait([fetcher, *workers.values()], return_when=asyncio.FIRST_COMPLETED)
+            if fetcher in done and fetcher.exception() is not None:
+                fetcher.result()
+            for wid, t in list(workers.items()):
+                if t in done:
+                    del workers[wid]
+                    if not t.cancelled():
+                        t.result()
+    finally:
+        for t in [fetcher, reporter, *([watcher] if watcher else []), *workers.values()]:
+            t.cancel()
+        # Hand back anything claimed but never started so other runners can take it
+        leftover = buffer.drain()
+        if leftover:
+            await storage.release_tasks([item[0] for item in leftover])
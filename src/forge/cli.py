@@ -4,15 +4,9 @@ import datetime as dt
 import os
 from pathlib import Path
 import click
-from rich.console import Console
-from rich.table import Table
 
-from .config import ensure_config, load_config, set_model, get_model, available_models
-from .models import make_provider
-from . import storage
-from .agent_manager import run_queue
-from .studio import launch_studio
-from .scheduler import run_scheduler
+# Heavy subsystems (anthropic, prompt_toolkit, rich, aiosqlite, yaml) are imported inside the
+# commands that need them so thin commands like `queue add` start fast.
 
 LOG_DIR = Path("logs")
 
@@ -21,6 +15,34 @@ def _setup_logging() -> None:
     LOG_DIR.mkdir(exist_ok=True)
 
 
+def _runner_options(cfg: dict) -> dict:
+    from .memory import MemoryStore
+    from .usage import BudgetGuard
+
+    opts = {
+        "retry_delay": float(cfg.get("retry_policy", {}).get("delay_seconds", 1.0)),
+        "rate_limit": float(cfg.get("rate_limit") or 0),
+        "budget": BudgetGuard.from_config(cfg),
+        "prices": cfg.get("pricing"),
+    }
+    if cfg.get("prefetch"):
+        opts["prefetch"] = int(cfg["prefetch"])
+    mem = cfg.get("memory") or {}
+    if mem.get("enabled"):
+        opts["memory"] = MemoryStore(
+            path=Path(mem["path"]).resolve() if mem.get("path") else None,
+            max_entries=int(mem.get("max_entries", 10_000)),
+            max_bytes=int(mem.get("max_bytes", 50_000_000)),
+            ttl_seconds=float(mem["ttl_seconds"]) if mem.get("ttl_seconds") else None,
+            cache_size=int(mem.get("cache_size", 1024)),
+        )
+        project = mem.get("project") or Path.cwd().name
+        opts["memory_namespace"] = MemoryStore.namespace(project, mem.get("agent") or "forge")
+        opts["memory_context"] = int(mem.get("context_entries", 3))
+        opts["memory_reuse"] = bool(mem.get("reuse_output", False))
+    return opts
+
+
 @click.group()
 def main():
     """Forge CLI control plane."""
@@ -30,6 +52,9 @@ def main():
 @main.command()
 def init():
     """Setup environment and initial config and database."""
+    from .config import ensure_config
+    from . import storage
+
     ensure_config()
     asyncio.run(storage.init_db())
     click.echo("Initialized config and database.")
@@ -78,6 +103,7 @@ def model():
 @model.command("list")
 def model_list():
     import shutil, subprocess
+    from .config import available_models
     printed = False
     anth = shutil.which("anthropic")
     if anth:
@@ -100,6 +126,8 @@ def model_list():
 @model.command("set")
 @click.argument("model")
 def model_set_cmd(model: str):
+    from .config import set_model
+
     set_model(model)
     click.echo(f"Default model set to {model}")
 
@@ -108,6 +136,7 @@ def model_set_cmd(model: str):
 @click.option("--include-debug", is_flag=True, help="Include debug-echo in menu")
 def model_select(include_debug: bool):
     import shutil, subprocess, sys
+    from .config import available_models, set_model
     # Gather models from Anthropic CLI if available
     names: list[str] = []
     anth = shutil.which("anthropic")
@@ -150,12 +179,16 @@ def agent():
 @click.option("--model", "model_override", default=None, help="Override model")
 @click.option("--retries", default=None, type=int, help="Retry attempts per task")
 def agent_spawn(n: int, model_override: str | None, retries: int | None):
+    from .config import load_config, get_model
+    from .models import make_provider
+    from .agent_manager import run_queue
+
     cfg = load_config()
     model = model_override or cfg.get("model", get_model())
-    model_name, provider = make_provider(model)
+    model_name, provider = make_provider(model, cfg)
     retry_count = retries if retries is not None else int(cfg.get("retry_policy", {}).get("max_retries", 0))
     click.echo(f"Running queue with concurrency={n} on model={model_name} (retries={retry_count})")
-    asyncio.run(run_queue(n, provider, retry_count))
+    asyncio.run(run_queue(n, provider, retry_count, **_runner_options(cfg)))
 
 
 @main.group()
@@ -166,17 +199,87 @@ def queue():
 
 @queue.command("add")
 @click.argument("task")
-def queue_add(task: str):
-    asyncio.run(storage.init_db())
-    task_id = asyncio.run(storage.enqueue_task(task))
+@click.option("--queue", "queue_name", default="default", help="Queue name used for usage reports")
+def queue_add(task: str, queue_name: str):
+    from . import daemon
+
+    try:
+        task_id = daemon.request("enqueue", payload=task, queue=queue_name)["id"]
+    except daemon.DaemonNoReply as e:
+        # The daemon may have committed it already; enqueueing again could duplicate the task
+        raise click.ClickException(f"{e}. Check `forge queue list` before retrying.")
+    except daemon.DaemonUnavailable:
+        from . import storage
+
+        async def _add() -> int:
+            await storage.init_db()
+            return await storage.enqueue_task(task, queue_name)
+
+        task_id = asyncio.run(_add())
     click.echo(f"Queued task id={task_id}")
 
 
+@queue.command("fanout")
+@click.argument("subtasks", nargs=-1, required=True)
+@click.option("--join", "join_task", required=True, help="Task that runs over all subtask results")
+@click.option("--queue", "queue_name", default="default", help="Queue name used for usage reports")
+def queue_fanout(subtasks: tuple[str, ...], join_task: str, queue_name: str):
+    """Queue SUBTASKS to run in parallel, then a join task over their outputs."""
+    from . import dag, storage
+
+    async def _fanout():
+        await storage.init_db()
+        return await dag.fan_out(list(subtasks), join_task, queue_name)
+
+    join_id, child_ids = asyncio.run(_fanout())
+    click.echo(f"Queued {len(child_ids)} subtasks ids={child_ids[0]}..{child_ids[-1]}; join id={join_id}")
+
+
+@queue.command("mapreduce")
+@click.argument("source", type=click.Path(exists=True, allow_dash=True, path_type=Path))
+@click.option("--map", "map_prompt", required=True, help="Prompt applied to every chunk")
+@click.option("--reduce", "reduce_prompt", required=True, help="Prompt that combines results")
+@click.option("--chunk-chars", default=8000, type=int, help="Max characters per chunk")
+@click.option("--fanin", default=20, type=int, help="Max inputs per reduce task")
+@click.option("--queue", "queue_name", default="default", help="Queue name used for usage reports")
+def queue_mapreduce(source: Path, map_prompt: str, reduce_prompt: str, chunk_chars: int, fanin: int, queue_name: str):
+    """Split SOURCE (file, directory or - for stdin) into map tasks under a reduce tree."""
+    import sys
+    from . import dag, storage
+
+    if str(source) == "-":
+        chunks = dag.iter_chunks(sys.stdin, chunk_chars)
+    else:
+        chunks = dag.iter_path_chunks(source, chunk_chars)
+
+    async def _mapreduce() -> int:
+        await storage.init_db()
+        return await dag.map_reduce(chunks, map_prompt, reduce_prompt, fanin=fanin, queue=queue_name)
+
+    try:
+        root_id = asyncio.run(_mapreduce())
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Queued map-reduce; final reduce task id={root_id}")
+
+
 @queue.command("list")
 @click.option("--limit", default=20, type=int)
 def queue_list(limit: int):
-    asyncio.run(storage.init_db())
-    rows = asyncio.run(storage.list_tasks(limit))
+    from . import daemon
+    from rich.console import Console
+    from rich.table import Table
+
+    try:
+        rows = daemon.request("list", limit=limit)["rows"]
+    except (daemon.DaemonUnavailable, daemon.DaemonNoReply):
+        from . import storage
+
+        async def _list():
+            await storage.init_db()
+            return await storage.list_tasks(limit)
+
+        rows = asyncio.run(_list())
     table = Table(title="Tasks")
     for col in ["id", "payload", "status", "created_at", "updated_at"]:
         table.add_column(col)
@@ -190,16 +293,85 @@ def queue_list(limit: int):
 @click.option("--model", "model_override", default=None)
 @click.option("--retries", default=None, type=int)
 def queue_run(concurrency: int | None, model_override: str | None, retries: int | None):
+    from .config import load_config, get_model
+    from .models import make_provider
+    from .agent_manager import run_queue
+
     cfg = load_config()
     n = concurrency or int(cfg.get("concurrency_limit", 1))
     model = model_override or cfg.get("model", get_model())
-    model_name, provider = make_provider(model)
+    model_name, provider = make_provider(model, cfg)
     retry_count = retries if retries is not None else int(cfg.get("retry_policy", {}).get("max_retries", 0))
     # Prompt login if using Anthropic
-    if model_name != "debug-echo" and hasattr(provider, "_ensure_client"):
-        asyncio.run(provider._ensure_client())  # type: ignore[attr-defined]
+    if model_name != "debug-echo":
+        asyncio.run(provider.ensure_ready())
     click.echo(f"Running queue with concurrency={n} on model={model_name} (retries={retry_count})")
-    asyncio.run(run_queue(n, provider, retry_count))
+    asyncio.run(run_queue(n, provider, retry_count, watch_config=True, **_runner_options(cfg)))
+
+
+@queue.command("stats")
+def queue_stats():
+    """Task counts by status (plus worker/buffer state when a daemon is running)."""
+    from . import daemon
+
+    try:
+        stats = daemon.request("stats")
+    except (daemon.DaemonUnavailable, daemon.DaemonNoReply):
+        from . import storage
+
+        async def _counts():
+            await storage.init_db()
+            return await storage.task_counts()
+
+        stats = {"tasks": asyncio.run(_counts())}
+    for status, count in sorted(stats["tasks"].items()):
+        click.echo(f"{status:<12} {count}")
+    if "workers" in stats:
+        w = stats["workers"]
+        click.echo(f"workers      {w['running']}/{w['total']} running")
+    if stats.get("buffer"):
+        b = stats["buffer"]
+        click.echo(f"buffer       {b['depth']}/{b['maxsize']} (item wait {b['item_wait_ms_avg']}ms)")
+
+
+@main.command()
+@click.option("--by", type=click.Choice(["model", "hour", "queue", "task"]), default="model")
+@click.option("--since", default="in:24h", help="ISO time (UTC) or relative window like in:24h, in:7d")
+def usage(by: str, since: str):
+    """Token usage and cost report."""
+    from rich.console import Console
+    from rich.table import Table
+    from . import storage
+
+    if since.startswith("in:"):
+        val = since.split(":", 1)[1]
+        units = {"m": "minutes", "h": "hours", "d": "days"}
+        if val[-1:] not in units or not val[:-1].isdigit():
+            raise click.ClickException("Unsupported relative window; use e.g. in:90m, in:24h, in:7d")
+        since_iso = (dt.datetime.utcnow() - dt.timedelta(**{units[val[-1]]: int(val[:-1])})).isoformat()
+    else:
+        try:
+            since_iso = dt.datetime.fromisoformat(since).isoformat()
+        except ValueError as e:
+            raise click.ClickException(f"Invalid time format: {e}")
+
+    async def _report():
+        await storage.init_db()
+        return await storage.usage_report(by, since_iso)
+
+    rows = asyncio.run(_report())
+    table = Table(title=f"Usage by {by} since {since_iso} UTC")
+    for col in [by, "calls", "tasks", "input", "output", "cache_read", "cache_write", "cost_usd", "avg_latency_ms"]:
+        table.add_column(col, justify="left" if col == by else "right")
+    totals = [0] * 7
+    for key, *vals in rows:
+        for i, v in enumerate(vals[:7]):
+            totals[i] += v or 0
+        *counts, cost, latency = vals
+        table.add_row(str(key), *[f"{v or 0:,}" for v in counts], f"{cost or 0:.4f}", f"{latency or 0:.0f}")
+    if rows:
+        table.add_row("total", *[f"{v:,}" for v in totals[:6]], f"{totals[6]:.4f}", "", style="bold")
+    Console().print(table)
 
 
 @main.group()
@@ -212,9 +384,19 @@ def schedule():
 @click.argument("task")
 @click.argument("time")
 def schedule_add(task: str, time: str):
-    # time can be ISO (UTC) or relative 'in:5m', 'in:2h'
+    # time can be ISO (UTC), relative 'in:5m', 'in:2h', or recurring 'cron:*/5 * * * *'
+    from .cron import Cron
+    from . import storage
+
     when: dt.datetime
-    if time.startswith("in:"):
+    cron_expr: str | None = None
+    if time.startswith("cron:"):
+        cron_expr = time.split(":", 1)[1].strip()
+        try:
+            when = Cron(cron_expr).next_after(dt.datetime.utcnow())
+        except ValueError as e:
+            raise click.ClickException(f"Invalid cron expression: {e}")
+    elif time.startswith("in:"):
         val = time.split(":", 1)[1]
         unit = val[-1]
         num = int(val[:-1])
@@ -232,14 +414,23 @@ def schedule_add(task: str, time: str):
             when = dt.datetime.fromisoformat(time)
         except Exception as e:
             raise click.ClickException(f"Invalid time format: {e}")
-    asyncio.run(storage.init_db())
-    sched_id = asyncio.run(storage.add_schedule(task, when.isoformat()))
-    click.echo(f"Scheduled task id={sched_id} at {when.isoformat()} UTC")
+
+    async def _add() -> int:
+        await storage.init_db()
+        return await storage.add_schedule(task, when.isoformat(), cron_expr)
+
+    sched_id = asyncio.run(_add())
+    if cron_expr:
+        click.echo(f"Scheduled recurring task id={sched_id} ({cron_expr}), next run {when.isoformat()} UTC")
+    else:
+        click.echo(f"Scheduled task id={sched_id} at {when.isoformat()} UTC")
 
 
 @schedule.command("run")
-@click.option("--interval", default=1.0, type=float)
+@click.option("--interval", default=1.0, type=float, help="Max seconds before new schedules are noticed")
 def schedule_run(interval: float):
+    from .scheduler import run_scheduler
+
     click.echo("Running scheduler...")
     asyncio.run(run_scheduler(interval))
 
@@ -247,11 +438,16 @@ def schedule_run(interval: float):
 @main.command()
 def monitor():
     """Simple monitor of recent tasks."""
-    asyncio.run(storage.init_db())
+    from rich.console import Console
+    from rich.table import Table
+    from . import storage
+
     console = Console()
-    try:
+
+    async def _loop():
+        await storage.init_db()
         while True:
-            rows = asyncio.run(storage.list_tasks(20))
+            rows = await storage.list_tasks(20)
             table = Table(title="Recent Tasks")
             for col in ["id", "payload", "status", "created_at", "updated_at"]:
                 table.add_column(col)
@@ -259,7 +455,10 @@ def monitor():
                 table.add_row(*[str(x) for x in r])
             console.clear()
             console.print(table)
-            asyncio.run(asyncio.sleep(2))
+            await asyncio.sleep(2)
+
+    try:
+        asyncio.run(_loop())
     except KeyboardInterrupt:
         pass
 
@@ -276,13 +475,20 @@ def commands(slash: str):
         "/model set <name>",
         "/agent spawn <n>",
         "/queue add <task>",
+        "/queue fanout --join <task> <subtask>...",
+        "/queue mapreduce <path> --map <prompt> --reduce <prompt>",
         "/queue list",
         "/queue run",
+        "/queue stats",
+        "/usage",
         "/schedule add <task> <time>",
         "/schedule run",
         "/monitor",
         "/studio",
         "/yolo",
+        "/daemon",
+        "/daemon status",
+        "/daemon stop",
     ]
     if slash:
         items = [x for x in items if x.startswith(slash)]
@@ -294,17 +500,25 @@ def commands(slash: str):
 @click.option("--model", "model_override", default=None)
 @click.option("--retries", default=None, type=int)
 def studio(concurrency: int | None, model_override: str | None, retries: int | None):
+    from .config import load_config, get_model
+    from .models import make_provider
+    from .agent_manager import run_queue
+    from .studio import launch_studio
+    from . import storage
+
     cfg = load_config()
     n = concurrency or int(cfg.get("concurrency_limit", 1))
     model = model_override or cfg.get("model", get_model())
-    model_name, provider = make_provider(model)
+    model_name, provider = make_provider(model, cfg)
     retry_count = retries if retries is not None else int(cfg.get("retry_policy", {}).get("max_retries", 0))
 
     async def runner():
-        await run_queue(n, provider, retry_count, continuous=True)
+        await run_queue(
+            n, provider, retry_count, continuous=True, stream_output=True, watch_config=True, **_runner_options(cfg)
+        )
 
     async def enqueue(payload: str):
-        await storage.enqueue_task(payload)
+        return await storage.enqueue_task(payload)
 
     launch_studio(n, runner, enqueue)
 
@@ -315,13 +529,85 @@ def studio(concurrency: int | None, model_override: str | None, retries: int | N
 @click.option("--retries", default=None, type=int)
 def yolo(concurrency: int | None, model_override: str | None, retries: int | None):
     """Run queue continuously, no prompts, full auto."""
+    from .config import load_config, get_model
+    from .models import make_provider
+    from .agent_manager import run_queue
+
     cfg = load_config()
     n = concurrency or int(cfg.get("concurrency_limit", 1))
     model = model_override or cfg.get("model", get_model())
-    model_name, provider = make_provider(model)
+    model_name, provider = make_provider(model, cfg)
     retry_count = retries if retries is not None else int(cfg.get("retry_policy", {}).get("max_retries", 0))
     click.echo(f"Autopilot: concurrency={n} model={model_name} retries={retry_count}")
-    asyncio.run(run_queue(n, provider, retry_count, continuous=True))
+    asyncio.run(run_queue(n, provider, retry_count, continuous=True, watch_config=True, **_runner_options(cfg)))
+
+
+
+@main.group(invoke_without_command=True)
+@click.option("--concurrency", default=None, type=int)
+@click.option("--model", "model_override", default=None)
+@click.option("--retries", default=None, type=int)
+@click.option("--no-runner", is_flag=True, help="Only serve the socket; don't execute tasks")
+@click.pass_context
+def daemon(ctx, concurrency: int | None, model_override: str | None, retries: int | None, no_runner: bool):
+    """Keep DB, provider and runner warm; CLI commands talk to it over a Unix socket."""
+    if ctx.invoked_subcommand is not None:
+        return
+    from .config import load_config, get_model
+    from .daemon import Daemon, SOCKET_PATH
+
+    cfg = load_config()
+    runner = None
+    if not no_runner:
+        from .models import make_provider
+        from .agent_manager import run_queue
+
+        n = concurrency or int(cfg.get("concurrency_limit", 1))
+        model = model_override or cfg.get("model", get_model())
+        model_name, provider = make_provider(model, cfg)
+        retry_count = retries if retries is not None else int(cfg.get("retry_policy", {}).get("max_retries", 0))
+        if model_name != "debug-echo":
+            asyncio.run(provider.ensure_ready())
+
+        async def runner():
+            await run_queue(n, provider, retry_count, continuous=True, watch_config=True, **_runner_options(cfg))
+
+        click.echo(f"Daemon: concurrency={n} model={model_name} retries={retry_count} socket={SOCKET_PATH}")
+    else:
+        click.echo(f"Daemon (no runner): socket={SOCKET_PATH}")
+    try:
+        asyncio.run(Daemon(runner_factory=runner).serve())
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    except KeyboardInterrupt:
+        pass
+
+
+@daemon.command("status")
+def daemon_status():
+    from . import daemon as d
+
+    try:
+        reply = d.request("ping")
+    except d.DaemonUnavailable:
+        raise click.ClickException(f"No daemon running at {d.SOCKET_PATH}")
+    except d.DaemonNoReply:
+        raise click.ClickException(f"Daemon at {d.SOCKET_PATH} is not responding")
+    click.echo(f"Daemon running (pid={reply['pid']}) at {d.SOCKET_PATH}")
+
+
+@daemon.command("stop")
+def daemon_stop():
+    from . import daemon as d
+
+    try:
+        d.request("stop")
+    except d.DaemonUnavailable:
+        raise click.ClickException(f"No daemon running at {d.SOCKET_PATH}")
+    except d.DaemonNoReply as e:
+        raise click.ClickException(str(e))
+    click.echo("Daemon stopping.")
+
 
 
 if __name__ == "__main__":
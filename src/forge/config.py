@@ -1,11 +1,16 @@
 from __future__ import annotations
+import asyncio
+import copy
+import logging
 import os
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Callable, Dict, Optional, Tuple
 import yaml
 
 CONFIG_PATH = Path(os.getenv("FORGE_CONFIG", "config.yaml")).resolve()
 
+logger = logging.getLogger("config")
+
 DEFAULT_CONFIG: Dict[str, Any] = {
     "model": "debug-echo",
     "providers": {
@@ -15,21 +20,63 @@ DEFAULT_CONFIG: Dict[str, Any] = {
     "retry_policy": {"max_retries": 3, "delay_seconds": 2},
 }
 
+# Parsed config keyed by (path, mtime_ns, size); re-read only when the file changes
+_cache: Optional[Tuple[Tuple[Path, int, int], Dict[str, Any]]] = None
+
 
 def ensure_config() -> None:
     if not CONFIG_PATH.exists():
         CONFIG_PATH.write_text(yaml.safe_dump(DEFAULT_CONFIG, sort_keys=False))
 
 
+def _stat_key() -> Tuple[Path, int, int]:
+    try:
+        st = CONFIG_PATH.stat()
+    except FileNotFoundError:
+        ensure_config()
+        st = CONFIG_PATH.stat()
+    return CONFIG_PATH, st.st_mtime_ns, st.st_size
+
+
 def load_config() -> Dict[str, Any]:
-    ensure_config()
-    with open(CONFIG_PATH, "r") as f:
-        return yaml.safe_load(f) or {}
+    global _cache
+    key = _stat_key()
+    if _cache is None or _cache[0] != key:
+        with open(CONFIG_PATH, "r") as f:
+            _cache = (key, yaml.safe_load(f) or {})
+    # Callers mutate and save the result, so never hand out the cached dict itself
+    return copy.deepcopy(_cache[1])
 
 
 def save_config(cfg: Dict[str, Any]) -> None:
+    global _cache
     with open(CONFIG_PATH, "w") as f:
         yaml.safe_dump(cfg, f, sort_keys=False)
+    _cache = None
+
+
+async def watch_config(on_change: Callable[[Dict[str, Any]], None], interval: float = 1.0) -> None:
+    """Call ``on_change`` with the new config whenever the file's mtime or size changes."""
+    last = _stat_key()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            key = _stat_key()
+        except OSError:
+            continue
+        if key == last:
+            continue
+        last = key
+        try:
+            cfg = load_config()
+        except yaml.YAMLError:
+            # Half-written or invalid file; keep running on the previous config
+            continue
+        try:
+            on_change(cfg)
+        except Exception:
+            # A bad value (e.g. a mistyped concurrency_limit) must not end hot-reload for good
+            logger.exception("failed to apply config change; keeping previous settings")
 
 
 def set_model(model: str) -> None:
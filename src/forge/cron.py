@@ -0,0 +1,74 @@
+from __future__ import annotations
+import datetime as dt
+
+# (min, max) per field: minute hour day-of-month month day-of-week
+# (7 is accepted as an alias for Sunday)
+_BOUNDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+
+def _parse_field(field: str, lo: int, hi: int, dow: bool = False) -> set[int]:
+    values: set[int] = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step_s = part.split("/", 1)
+            step = int(step_s)
+            if step < 1:
+                raise ValueError(f"invalid cron step: {step_s}")
+        if part == "*":
+            start, end = lo, hi
+        elif "-" in part:
+            a, b = part.split("-", 1)
+            start, end = int(a), int(b)
+        else:
+            start = int(part)
+            # "5/15" means 5, 20, 35, ...
+            end = hi if step > 1 else start
+        if start < lo or end > hi or start > end:
+            raise ValueError(f"cron field out of range: {field}")
+        values.update(range(start, end + 1, step))
+    if dow:
+        values = {0 if v == 7 else v for v in values}
+    return values
+
+
+class Cron:
+    """Five-field cron expression (minute hour day-of-month month day-of-week), UTC."""
+
+    def __init__(self, expr: str):
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron expression needs 5 fields, got {len(fields)}: {expr!r}")
+        self.expr = expr
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            _parse_field(f, lo, hi, dow=(i == 4)) for i, (f, (lo, hi)) in enumerate(zip(fields, _BOUNDS))
+        )
+        # Standard cron: when both day fields are restricted, either may match
+        self._dom_any = fields[2] == "*"
+        self._dow_any = fields[4] == "*"
+
+    def _day_matches(self, d: dt.datetime) -> bool:
+        dom = d.day in self.days
+        dow = (d.weekday() + 1) % 7 in self.weekdays
+        if self._dom_any or self._dow_any:
+            return dom and dow
+        return dom or dow
+
+    def next_after(self, after: dt.datetime) -> dt.datetime:
+        t = after.replace(second=0, microsecond=0) + dt.timedelta(minutes=1)
+        limit = after + dt.timedelta(days=366 * 5)
+        while t <= limit:
+            if t.month not in self.months:
+                t = (t.replace(day=1, hour=0, minute=0) + dt.timedelta(days=32)).replace(day=1)
+                continue
+            if not self._day_matches(t):
+                t = t.replace(hour=0, minute=0) + dt.timedelta(days=1)
+                continue
+            if t.hour not in self.hours:
+                t = t.replace(minute=0) + dt.timedelta(hours=1)
+                continue
+            if t.minute not in self.minutes:
+                t += dt.timedelta(minutes=1)
+                continue
+            return t
+        raise ValueError(f"cron expression never fires: {self.expr!r}")
@@ -0,0 +1,159 @@
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import os
+import socket
+from pathlib import Path
+from typing import Any, Callable, Coroutine, Optional
+
+# Keep module-level imports to the stdlib: the CLI imports this on every enqueue.
+SOCKET_PATH = Path(os.getenv("FORGE_SOCKET", "forge.sock")).resolve()
+
+logger = logging.getLogger("daemon")
+
+
+class DaemonUnavailable(RuntimeError):
+    """The request never reached a daemon; safe to fall back to the DB."""
+
+
+class DaemonNoReply(RuntimeError):
+    """The request was sent but not confirmed; the daemon may still have acted on it."""
+
+
+def request(cmd: str, socket_path: Optional[Path] = None, timeout: float = 10.0, **args: Any) -> dict[str, Any]:
+    """Send one command to a running daemon and return its reply (blocking, stdlib only)."""
+    path = socket_path or SOCKET_PATH
+    if not path.exists():
+        raise DaemonUnavailable(f"no daemon socket at {path}")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(str(path))
+        except OSError as e:
+            # Refused, missing, or a connect timeout: nothing was sent
+            raise DaemonUnavailable(f"daemon not listening on {path}: {e}") from e
+        try:
+            sock.sendall(json.dumps({"cmd": cmd, **args}).encode() + b"\n")
+            buf = b""
+            while not buf.endswith(b"\n"):
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                buf += chunk
+        except OSError as e:
+            raise DaemonNoReply(f"daemon on {path} did not confirm {cmd!r}: {e}") from e
+    if not buf.endswith(b"\n"):
+        raise DaemonNoReply(f"daemon on {path} closed the connection before confirming {cmd!r}")
+    reply = json.loads(buf)
+    if not reply.get("ok"):
+        raise RuntimeError(reply.get("error") or "daemon returned an error")
+    return reply
+
+
+class Daemon:
+    """Long-lived process holding the DB, provider and runner warm behind a Unix socket.
+
+    Protocol: one JSON object per line in each direction. Commands are
+    ``ping``, ``enqueue`` (payload, queue), ``list`` (limit), ``stats`` and ``stop``.
+    """
+
+    def __init__(self, socket_path: Optional[Path] = None, runner_factory: Optional[Callable[[], Coroutine[Any, Any, None]]] = None):
+        self.socket_path = socket_path or SOCKET_PATH
+        self.runner_factory = runner_factory
+        self.workers: dict[int, str] = {}
+        self.buffer: dict[str, Any] = {}
+        self._stop = asyncio.Event()
+
+    async def handle(self, req: dict[str, Any]) -> dict[str, Any]:
+        from . import storage
+
+        cmd = req.get("cmd")
+        if cmd == "ping":
+            return {"ok": True, "pid": os.getpid()}
+        if cmd == "enqueue":
+            payload = req.get("payload")
+            if not isinstance(payload, str) or not payload:
+                return {"ok": False, "error": "enqueue needs a non-empty 'payload'"}
+            return {"ok": True, "id": await storage.enqueue_task(payload, str(req.get("queue") or "default"))}
+        if cmd == "list":
+            rows = await storage.list_tasks(int(req.get("limit", 20)))
+            return {"ok": True, "rows": [list(r) for r in rows]}
+        if cmd == "stats":
+            running = sum(1 for s in self.workers.values() if s == "running")
+            return {
+                "ok": True,
+                "tasks": await storage.task_counts(),
+                "workers": {"total": len([s for s in self.workers.values() if s != "stopped"]), "running": running},
+                "buffer": self.buffer,
+            }
+        if cmd == "stop":
+            self._stop.set()
+            return {"ok": True}
+        return {"ok": False, "error": f"unknown command: {cmd!r}"}
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                try:
+                    reply = await self.handle(json.loads(line))
+                except Exception as e:
+                    logger.exception("daemon command failed")
+                    reply = {"ok": False, "error": str(e)}
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+        except (asyncio.CancelledError, ConnectionError):
+            # Daemon shutting down or client went away; nothing left to answer
+            pass
+        finally:
+            writer.close()
+
+    async def _track_events(self) -> None:
+        from .events import bus
+
+        events = bus.subscribe()
+        try:
+            while True:
+                ev = await events.get()
+                if ev.kind == "worker" and ev.worker_id is not None:
+                    self.workers[ev.worker_id] = ev.status or "idle"
+                elif ev.kind == "queue" and ev.data:
+                    self.buffer = ev.data
+        finally:
+            bus.unsubscribe(events)
+
+    def _claim_socket(self) -> None:
+        if not self.socket_path.exists():
+            return
+        try:
+            request("ping", self.socket_path, timeout=1.0)
+        except (DaemonUnavailable, OSError, ValueError):
+            # Left behind by a daemon that died; safe to replace
+            self.socket_path.unlink()
+            return
+        raise RuntimeError(f"a forge daemon is already listening on {self.socket_path}")
+
+    async def serve(self) -> None:
+        from . import storage
+
+        await storage.init_db()
+        self._claim_socket()
+        server = await asyncio.start_unix_server(self._client, path=str(self.socket_path))
+        background = [asyncio.create_task(self._track_events())]
+        if self.runner_factory is not None:
+            background.append(asyncio.create_task(self.runner_factory()))
+        logger.info("daemon listening on %s", self.socket_path)
+        try:
+            async with server:
+                stop = asyncio.create_task(self._stop.wait())
+                done, _ = await asyncio.wait([stop, *background[1:]], return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    if t is not stop:
+                        # The runner exited on its own, most likely with an error
+                        t.result()
+                stop.cancel()
+        finally:
+            for t in background:
+                t.cancel()
+            await asyncio.gather(*background, return_exceptions=True)
+            self.socket_path.unlink(missing_ok=True)
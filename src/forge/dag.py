@@ -0,0 +1,142 @@
+from __future__ import annotations
+import asyncio
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Sequence
+from . import storage
+
+# Per-child cap when folding results into a join prompt
+JOIN_INPUT_CHARS = 8000
+# Joins left unsealed this long are assumed to belong to a crashed builder
+ORPHAN_JOIN_SECONDS = 3600.0
+
+
+def join_prompt(payload: str, inputs: Sequence[tuple[int, Optional[str]]]) -> str:
+    parts = [payload, "", "Results from subtasks:"]
+    for child_id, output in inputs:
+        parts.append(f"--- subtask {child_id} ---")
+        parts.append((output or "")[:JOIN_INPUT_CHARS])
+    return "\n".join(parts)
+
+
+def iter_chunks(lines: Iterable[str], max_chars: int) -> Iterator[str]:
+    """Group lines into chunks of at most ``max_chars`` (a longer single line is split)."""
+    buf: list[str] = []
+    size = 0
+    for line in lines:
+        while len(line) > max_chars:
+            if buf:
+                yield "".join(buf)
+                buf, size = [], 0
+            yield line[:max_chars]
+            line = line[max_chars:]
+        if size + len(line) > max_chars and buf:
+            yield "".join(buf)
+            buf, size = [], 0
+        buf.append(line)
+        size += len(line)
+    if buf:
+        yield "".join(buf)
+
+
+def iter_path_chunks(path: Path, max_chars: int) -> Iterator[str]:
+    """Stream chunks from a file, or every text file under a directory, one file at a time."""
+    files = [path] if path.is_file() else sorted(p for p in path.rglob("*") if p.is_file())
+    for f in files:
+        if any(part.startswith(".") for part in f.relative_to(path).parts if path.is_dir()):
+            continue
+        try:
+            with open(f, "r", encoding="utf-8") as fh:
+                for chunk in iter_chunks(fh, max_chars):
+                    yield f"# file: {f}\n{chunk}"
+        except (UnicodeDecodeError, OSError):
+            # Binary or unreadable; nothing for a text model to review
+            continue
+
+
+async def fan_out(subtasks: Sequence[str], join_payload: str, queue: str = "default") -> tuple[int, list[int]]:
+    """Enqueue ``subtasks`` in parallel plus a join task that runs over their results."""
+    return await storage.enqueue_fan_out(join_payload, subtasks, queue)
+
+
+async def map_reduce(
+    chunks: Iterable[str],
+    map_prompt: str,
+    reduce_prompt: str,
+    fanin: int = 20,
+    batch: int = 100,
+    queue: str = "default",
+) -> int:
+    """Turn a stream of chunks into map tasks under a tree of reduce joins.
+
+    Each reduce sees at most ``fanin`` inputs, so per-call context stays
+    bounded however large the input is. Map tasks are enqueued in batches as
+    chunks arrive, so workers start before the input has been fully read.
+    Returns the id of the root reduce task. If building the tree fails
+    part-way (bad input, Ctrl-C), everything enqueued so far that has not
+    started is failed rather than left to run under a reduce that never will.
+    """
+    fanin = max(2, fanin)
+    # Per tree level: the open join, how many children it has, and finished joins from the level
+    # below still waiting for a parent (one is only created once there are two to combine)
+    levels: list[dict] = []
+    created: list[int] = []
+
+    async def add(level: int, payloads: Sequence[str] = (), child_ids: Sequence[int] = ()) -> None:
+        if level == len(levels):
+            levels.append({"join": None, "count": 0, "waiting": []})
+        lv = levels[level]
+        if lv["join"] is None:
+            if child_ids:
+                lv["waiting"].extend(child_ids)
+                if len(lv["waiting"]) < 2:
+                    return
+                child_ids, lv["waiting"] = lv["waiting"], []
+            join_id = await storage.create_join(reduce_prompt, queue)
+            created.append(join_id)
+            lv["join"] = join_id
+        join_id = lv["join"]
+        if payloads:
+            await storage.add_children(join_id, payloads, queue)
+        for child_id in child_ids:
+            await storage.link_child(join_id, child_id)
+        lv["count"] += len(payloads) + len(child_ids)
+        if lv["count"] >= fanin:
+            levels[level] = {"join": None, "count": 0, "waiting": []}
+            await storage.seal_join(join_id)
+            await add(level + 1, child_ids=[join_id])
+
+    pending: list[str] = []
+
+    async def flush() -> None:
+        while pending:
+            room = fanin - (levels[0]["count"] if levels else 0)
+            take, pending[:] = pending[:room], pending[room:]
+            await add(0, payloads=take)
+
+    try:
+        for chunk in chunks:
+            pending.append(f"{map_prompt}\n\n{chunk}")
+            if len(pending) >= batch:
+                await flush()
+        await flush()
+        if not levels:
+            raise ValueError("map_reduce needs at least one chunk")
+
+        # Close partial joins bottom-up, passing each to the level above; the top one is the root
+        level = 0
+        while True:
+            lv = levels[level]
+            top = level == len(levels) - 1
+            if lv["join"] is not None:
+                await storage.seal_join(lv["join"])
+                if top:
+                    return lv["join"]
+                await add(level + 1, child_ids=[lv["join"]])
+            elif lv["waiting"]:
+                if top:
+                    return lv["waiting"][0]
+                await add(level + 1, child_ids=lv["waiting"])
+            level += 1
+    except BaseException:
+        await asyncio.shield(storage.abandon_joins(created))
+        raise
@@ -0,0 +1,56 @@
+from __future__ import annotations
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+
+@dataclass
+class TaskEvent:
+    # "task" (status change), "output" (streamed chunk), "worker" (worker status) or "queue" (buffer metrics)
+    kind: str
+    task_id: Optional[int] = None
+    worker_id: Optional[int] = None
+    status: Optional[str] = None
+    text: Optional[str] = None
+    data: Optional[dict[str, Any]] = None
+    ts: float = field(default_factory=time.time)
+
+
+# Task payloads can be huge (map chunks, join prompts with child outputs); events and the
+# studio only ever show a one-line preview
+PREVIEW_CHARS = 200
+
+
+def preview(text: Optional[str], chars: int = PREVIEW_CHARS) -> str:
+    lines = (text or "").lstrip().splitlines()
+    return lines[0][:chars] if lines else ""
+
+
+class EventBus:
+    """In-process fan-out of runner events to any number of subscribers.
+
+    Publishing never blocks the runner: a subscriber that falls behind loses
+    its oldest events rather than applying backpressure.
+    """
+
+    def __init__(self) -> None:
+        self._subscribers: list[asyncio.Queue[TaskEvent]] = []
+
+    def subscribe(self, maxsize: int = 10000) -> asyncio.Queue[TaskEvent]:
+        q: asyncio.Queue[TaskEvent] = asyncio.Queue(maxsize=maxsize)
+        self._subscribers.append(q)
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue[TaskEvent]) -> None:
+        if q in self._subscribers:
+            self._subscribers.remove(q)
+
+    def publish(self, event: TaskEvent) -> None:
+        for q in self._subscribers:
+            if q.full():
+                q.get_nowait()
+            q.put_nowait(event)
+
+
+bus = EventBus()
@@ -1,9 +1,195 @@
+from __future__ import annotations
+import re
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+import aiosqlite
+from . import storage
+
+_WORD = re.compile(r"[a-z0-9_]{3,}")
+
+
+def _words(text: str) -> set[str]:
+    return set(_WORD.findall(text.lower()))
+
+
 class Memory:
-    def __init__(self):
-        self.state: dict[str, object] = {}
+    """Bounded in-process LRU map; the hot tier in front of MemoryStore."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.state: OrderedDict[str, object] = OrderedDict()
 
     def get(self, key: str, default=None):
-        return self.state.get(key, default)
+        if key not in self.state:
+            return default
+        self.state.move_to_end(key)
+        return self.state[key]
 
     def set(self, key: str, value):
         self.state[key] = value
+        self.state.move_to_end(key)
+        while len(self.state) > self.max_entries:
+            self.state.popitem(last=False)
+
+    def pop(self, key: str, default=None):
+        return self.state.pop(key, default)
+
+
+class MemoryStore:
+    """Persistent key/value memory namespaced per project and agent.
+
+    Entries live in SQLite (memory-mapped reads) with optional TTL, and each
+    namespace is capped by entry count and total bytes, evicting the least
+    recently used first. Reads go through a Memory hot cache.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        max_entries: int = 10_000,
+        max_bytes: int = 50_000_000,
+        ttl_seconds: Optional[float] = None,
+        cache_size: int = 1024,
+        mmap_bytes: int = 64 * 1024 * 1024,
+    ):
+        self._path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.mmap_bytes = mmap_bytes
+        # key -> (value, expires_at)
+        self.cache = Memory(cache_size)
+        # Cache hits not yet written to accessed_at; flushed on the next DB round-trip
+        self._touched: dict[tuple[str, str], float] = {}
+
+    @staticmethod
+    def namespace(project: str, agent: str) -> str:
+        return f"{project}/{agent}"
+
+    @property
+    def path(self) -> Path:
+        return self._path or storage.DB_PATH
+
+    def _connect(self):
+        return aiosqlite.connect(self.path)
+
+    async def _open(self, db: aiosqlite.Connection) -> None:
+        await db.execute(f"PRAGMA mmap_size={int(self.mmap_bytes)}")
+
+    async def _flush_touched(self, db: aiosqlite.Connection) -> None:
+        if not self._touched:
+            return
+        touched, self._touched = self._touched, {}
+        await db.executemany(
+            "UPDATE memory SET accessed_at=MAX(accessed_at, ?) WHERE namespace=? AND key=?",
+            [(ts, ns, key) for (ns, key), ts in touched.items()],
+        )
+
+    async def init(self) -> None:
+        async with self._connect() as db:
+            await db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS memory (
+                  namespace TEXT NOT NULL,
+                  key TEXT NOT NULL,
+                  value TEXT NOT NULL,
+                  topic TEXT NOT NULL DEFAULT '',
+                  size INTEGER NOT NULL,
+                  accessed_at REAL NOT NULL,
+                  expires_at REAL,
+                  PRIMARY KEY (namespace, key)
+                )
+                """
+            )
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_memory_lru ON memory(namespace, accessed_at)")
+            await db.commit()
+
+    async def get(self, namespace: str, key: str) -> Optional[str]:
+        now = time.time()
+        ck = f"{namespace}\0{key}"
+        hit = self.cache.get(ck)
+        if hit is not None:
+            value, expires_at = hit
+            if expires_at is None or expires_at > now:
+                self._touched[(namespace, key)] = now
+                return value
+            self.cache.pop(ck)
+        async with self._connect() as db:
+            await self._open(db)
+            cur = await db.execute(
+                "SELECT value, expires_at FROM memory WHERE namespace=? AND key=? AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, key, now),
+            )
+            row = await cur.fetchone()
+            if not row:
+                return None
+            await db.execute("UPDATE memory SET accessed_at=? WHERE namespace=? AND key=?", (now, namespace, key))
+            await self._flush_touched(db)
+            await db.commit()
+        self.cache.set(ck, (row[0], row[1]))
+        return row[0]
+
+    async def set(self, namespace: str, key: str, value: str, topic: str = "", ttl_seconds: Optional[float] = None) -> None:
+        now = time.time()
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires_at = now + ttl if ttl else None
+        async with self._connect() as db:
+            await self._open(db)
+            await db.execute(
+                "INSERT OR REPLACE INTO memory (namespace, key, value, topic, size, accessed_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (namespace, key, value, topic, len(value) + len(topic), now, expires_at),
+            )
+            await self._evict(db, namespace, now)
+            await db.commit()
+        self.cache.set(f"{namespace}\0{key}", (value, expires_at))
+
+    async def _evict(self, db: aiosqlite.Connection, namespace: str, now: float) -> None:
+        # Recency from cache hits must land before choosing what to evict
+        await self._flush_touched(db)
+        await db.execute("DELETE FROM memory WHERE namespace=? AND expires_at IS NOT NULL AND expires_at <= ?", (namespace, now))
+        cur = await db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM memory WHERE namespace=?", (namespace,))
+        row = await cur.fetchone()
+        count, total = row if row else (0, 0)
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # Walk from least recently used until both limits hold
+        cur = await db.execute(
+            "SELECT key, size FROM memory WHERE namespace=? ORDER BY accessed_at", (namespace,)
+        )
+        doomed = []
+        async for key, size in cur:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            doomed.append((namespace, key))
+            count -= 1
+            total -= size
+        await db.executemany("DELETE FROM memory WHERE namespace=? AND key=?", doomed)
+        for ns, key in doomed:
+            self.cache.pop(f"{ns}\0{key}")
+
+    async def relevant(self, namespace: str, query: str, limit: int = 3, scan: int = 500) -> list[tuple[str, str]]:
+        """Entries whose topic shares the most words with ``query``, among the ``scan`` most recently used."""
+        words = _words(query)
+        if not words:
+            return []
+        async with self._connect() as db:
+            await self._open(db)
+            if self._touched:
+                await self._flush_touched(db)
+                await db.commit()
+            cur = await db.execute(
+                "SELECT key, value, topic FROM memory WHERE namespace=? AND (expires_at IS NULL OR expires_at > ?) "
+                "ORDER BY accessed_at DESC LIMIT ?",
+                (namespace, time.time(), scan),
+            )
+            rows = await cur.fetchall()
+        scored = []
+        for key, value, topic in rows:
+            score = len(words & _words(topic))
+            if score:
+                scored.append((score, key, value))
+        scored.sort(key=lambda r: r[0], reverse=True)
+        return [(key, value) for _, key, value in scored[:limit]]
@@ -1,15 +1,50 @@
 from __future__ import annotations
-from typing import Tuple
+from typing import Any, Optional, Tuple
 from .providers import (
     BaseProvider,
     EchoProvider,
     AnthropicProvider,
+    OllamaProvider,
+    HedgedProvider,
+    FailoverProvider,
 )
 
 
-def make_provider(model: str) -> Tuple[str, BaseProvider]:
+def _single_provider(model: str, cfg: dict[str, Any], max_retries: Optional[int] = None) -> Tuple[str, BaseProvider]:
     m = model.lower()
     if m.startswith("debug-echo") or m == "echo":
         return "debug-echo", EchoProvider()
+    if m.startswith("ollama:"):
+        host = (cfg.get("providers") or {}).get("ollama_host") or "http://localhost:11434"
+        return model, OllamaProvider(model.split(":", 1)[1], host)
     # Default: Anthropic/Claude
-    return model, AnthropicProvider(model)
+    return model, AnthropicProvider(model, max_retries=max_retries)
+
+
+def make_provider(model: str, cfg: Optional[dict[str, Any]] = None) -> Tuple[str, BaseProvider]:
+    cfg = cfg or {}
+    fallbacks = [f for f in (cfg.get("fallback_models") or []) if f != model]
+    provider: BaseProvider
+    if fallbacks:
+        breaker = cfg.get("circuit_breaker") or {}
+        # The chain handles recovery itself, so don't let each SDK client burn its own retries first
+        sdk_retries = int(breaker.get("sdk_retries", 0))
+        chain = [_single_provider(name, cfg, sdk_retries) for name in [model, *fallbacks]]
+        model = chain[0][0]
+        provider = FailoverProvider(
+            chain,
+            failure_threshold=int(breaker.get("failure_threshold", 5)),
+            reset_seconds=float(breaker.get("reset_seconds", 30)),
+            probe_timeout=float(breaker.get("probe_timeout", 60)),
+        )
+    else:
+        model, provider = _single_provider(model, cfg)
+    hedging = cfg.get("hedging") or {}
+    if hedging.get("enabled"):
+        provider = HedgedProvider(
+            provider,
+            percentile=float(hedging.get("percentile", 95)),
+            budget=float(hedging.get("budget", 0.05)),
+            min_samples=int(hedging.get("min_samples", 20)),
+        )
+    return model, provider
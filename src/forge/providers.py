@@ -1,11 +1,22 @@
 from __future__ import annotations
 import asyncio
+import json
+import logging
 import os
 import shutil
-from typing import Optional
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from typing import TYPE_CHECKING, Any, AsyncIterator, Optional, Sequence
+from .usage import Usage, record as record_usage
 
-# Anthropic
-from anthropic import AsyncAnthropic
+if TYPE_CHECKING:
+    # Anthropic SDK is slow to import; load it on first client use instead
+    from anthropic import AsyncAnthropic
+
+logger = logging.getLogger("providers")
 
 
 class BaseProvider:
@@ -14,27 +25,47 @@ class BaseProvider:
     async def generate(self, system_prompt: str, user_prompt: str) -> str:  # pragma: no cover
         raise NotImplementedError
 
+    async def ensure_ready(self) -> None:
+        # Hook for interactive credential setup before a run starts
+        return None
+
+    async def stream(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        # Providers without native streaming yield the whole response as one chunk
+        yield await self.generate(system_prompt, user_prompt)
+
 
 class EchoProvider(BaseProvider):
     name = "debug-echo"
 
     async def generate(self, system_prompt: str, user_prompt: str) -> str:
+        record_usage(Usage(self.name))
         return f"[ECHO]\nSYSTEM:\n{system_prompt}\nUSER:\n{user_prompt}"
 
 
 class AnthropicProvider(BaseProvider):
     name = "anthropic"
 
-    def __init__(self, model: str):
+    def __init__(self, model: str, max_retries: Optional[int] = None):
         self.model = model
-        self.client: Optional[AsyncAnthropic] = None
+        self.max_retries = max_retries
+        self.client: Optional["AsyncAnthropic"] = None
+
+    def _new_client(self) -> "AsyncAnthropic":
+        from anthropic import AsyncAnthropic
+
+        if self.max_retries is None:
+            return AsyncAnthropic()
+        return AsyncAnthropic(max_retries=self.max_retries)
+
+    async def ensure_ready(self) -> None:
+        await self._ensure_client()
 
     async def _ensure_client(self) -> None:
         if self.client is not None:
             return
         try:
             # Newer SDKs may discover credentials from `anthropic login` automatically
-            self.client = AsyncAnthropic()
+            self.client = self._new_client()
             return
         except Exception:
             pass
@@ -47,15 +78,293 @@ class AnthropicProvider(BaseProvider):
         proc = await asyncio.create_subprocess_exec(anth, "login")
         await proc.wait()
         # Retry client creation
-        self.client = AsyncAnthropic()
+        self.client = self._new_client()
+
+    def _record(self, usage: Any, started: float) -> None:
+        record_usage(
+            Usage(
+                self.model,
+                input_tokens=getattr(usage, "input_tokens", 0) or 0,
+                output_tokens=getattr(usage, "output_tokens", 0) or 0,
+                cache_read_tokens=getattr(usage, "cache_read_input_tokens", 0) or 0,
+                cache_creation_tokens=getattr(usage, "cache_creation_input_tokens", 0) or 0,
+                latency_ms=1000 * (time.monotonic() - started),
+            )
+        )
 
     async def generate(self, system_prompt: str, user_prompt: str) -> str:
         await self._ensure_client()
         assert self.client is not None
+        started = time.monotonic()
         msg = await self.client.messages.create(
             model=self.model,
             max_tokens=4096,
             system=system_prompt,
             messages=[{"role": "user", "content": user_prompt}],
         )
+        self._record(msg.usage, started)
         return "".join([block.text for block in msg.content if getattr(block, "type", None) == "text"]) or ""
+
+    async def stream(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        await self._ensure_client()
+        assert self.client is not None
+        started = time.monotonic()
+        async with self.client.messages.stream(
+            model=self.model,
+            max_tokens=4096,
+            system=system_prompt,
+            messages=[{"role": "user", "content": user_prompt}],
+        ) as stream:
+            async for text in stream.text_stream:
+                yield text
+            final = await stream.get_final_message()
+        self._record(final.usage, started)
+
+
+class OllamaProvider(BaseProvider):
+    name = "ollama"
+
+    def __init__(self, model: str, host: str = "http://localhost:11434", timeout: float = 300.0):
+        self.model = model
+        self.host = host.rstrip("/")
+        self.timeout = timeout
+
+    def _post(self, body: dict) -> dict:
+        req = urllib.request.Request(
+            f"{self.host}/api/chat",
+            data=json.dumps(body).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            return json.loads(resp.read())
+
+    async def generate(self, system_prompt: str, user_prompt: str) -> str:
+        body = {
+            "model": self.model,
+            "stream": False,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+        }
+        started = time.monotonic()
+        data = await asyncio.to_thread(self._post, body)
+        record_usage(
+            Usage(
+                f"ollama:{self.model}",
+                input_tokens=data.get("prompt_eval_count", 0) or 0,
+                output_tokens=data.get("eval_count", 0) or 0,
+                latency_ms=1000 * (time.monotonic() - started),
+            )
+        )
+        return (data.get("message") or {}).get("content", "")
+
+
+class HedgedProvider(BaseProvider):
+    """Wrap a provider and race a duplicate request when a call runs long.
+
+    If ``generate`` has not returned after the ``percentile`` of recent
+    latencies, a second identical request is fired and the first to finish
+    wins; the loser is cancelled. Extra requests are capped at ``budget``
+    (a fraction of all calls, e.g. 0.05 = at most 5% additional load).
+    """
+
+    def __init__(
+        self,
+        inner: BaseProvider,
+        percentile: float = 95.0,
+        budget: float = 0.05,
+        min_samples: int = 20,
+        window: int = 200,
+    ):
+        self.inner = inner
+        self.name = inner.name
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._tokens = 0.0
+        self.calls = 0
+        self.hedges = 0
+
+    async def ensure_ready(self) -> None:
+        await self.inner.ensure_ready()
+
+    def hedge_delay(self) -> Optional[float]:
+        if len(self._latencies) < self.min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        idx = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100.0))
+        return ordered[idx]
+
+    def _take_hedge_token(self) -> bool:
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            self.hedges += 1
+            return True
+        return False
+
+    async def _timed(self, system_prompt: str, user_prompt: str) -> tuple[str, float]:
+        start = time.monotonic()
+        out = await self.inner.generate(system_prompt, user_prompt)
+        return out, time.monotonic() - start
+
+    async def generate(self, system_prompt: str, user_prompt: str) -> str:
+        self.calls += 1
+        # Earn a fraction of a hedge per call; cap the bucket so idle periods can't bank a burst
+        self._tokens = min(self._tokens + self.budget, max(1.0, self.budget * self.min_samples))
+        delay = self.hedge_delay()
+        started = time.monotonic()
+        primary = asyncio.ensure_future(self._timed(system_prompt, user_prompt))
+        spawned = [primary]
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait({primary}, timeout=delay)
+                if not done and self._take_hedge_token():
+                    spawned.append(asyncio.ensure_future(self._timed(system_prompt, user_prompt)))
+                    pending = set(spawned)
+                    while pending:
+                        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                        for fut in done:
+                            if fut.exception() is None:
+                                out, elapsed = fut.result()
+                                # A winning hedge says little about the straggler; record how long the
+                                # primary had taken so far as a lower bound on its latency
+                                self._latencies.append(elapsed if fut is primary else time.monotonic() - started)
+                                return out
+                    # Both attempts failed; surface the primary's error
+                    return (await primary)[0]
+            out, elapsed = await primary
+            self._latencies.append(elapsed)
+            return out
+        finally:
+            # Also runs when the caller is cancelled; asyncio.wait would leave the calls running
+            for fut in spawned:
+                if not fut.done():
+                    fut.cancel()
+
+
+def is_outage(e: BaseException) -> bool:
+    """True for errors that mean the model is unavailable (overload, 5xx, 429, timeouts,
+    connection failures), not that this particular request was bad."""
+    status = getattr(e, "status_code", None)
+    if status is None and isinstance(e, urllib.error.HTTPError):
+        status = e.code
+    if isinstance(status, int):
+        return status in (408, 429) or status >= 500
+    if isinstance(e, (asyncio.TimeoutError, TimeoutError, OSError)):
+        return True
+    anthropic = sys.modules.get("anthropic")
+    # Covers APITimeoutError, a subclass
+    return anthropic is not None and isinstance(e, anthropic.APIConnectionError)
+
+
+class CircuitBreaker:
+    """Per-model breaker: opens after ``failure_threshold`` consecutive errors,
+    then half-opens after ``reset_seconds`` to let a single probe through.
+    A probe that takes longer than ``probe_timeout`` counts as a failure."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0, probe_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.probe_timeout = probe_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self._state = self.CLOSED
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self._state = self.HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def release_probe(self) -> None:
+        """Give up a probe without a verdict (e.g. it was cancelled) so the next call can probe."""
+        self._probing = False
+
+    # Once tripped, only the half-open probe's outcome counts: results from calls that started
+    # before the breaker opened would otherwise close or re-open it and make it flap.
+
+    def record_success(self, probe: bool = False) -> None:
+        if self._state != self.CLOSED and not probe:
+            return
+        self.failures = 0
+        self._probing = False
+        self._state = self.CLOSED
+
+    def record_failure(self, probe: bool = False) -> None:
+        if self._state != self.CLOSED and not probe:
+            return
+        self.failures += 1
+        self._probing = False
+        if probe or self.failures >= self.failure_threshold:
+            self._state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class FailoverProvider(BaseProvider):
+    """Try an ordered chain of models, skipping any whose breaker is open.
+
+    Only outages (see ``is_outage``) fail over and count against a breaker;
+    any other error is the request's fault and is raised as-is.
+    """
+
+    def __init__(
+        self,
+        chain: Sequence[tuple[str, BaseProvider]],
+        failure_threshold: int = 5,
+        reset_seconds: float = 30.0,
+        probe_timeout: float = 60.0,
+    ):
+        if not chain:
+            raise ValueError("failover chain must contain at least one provider")
+        self.chain = [(name, p, CircuitBreaker(failure_threshold, reset_seconds, probe_timeout)) for name, p in chain]
+        self.name = chain[0][1].name
+
+    async def ensure_ready(self) -> None:
+        await self.chain[0][1].ensure_ready()
+
+    async def generate(self, system_prompt: str, user_prompt: str) -> str:
+        last_exc: Optional[Exception] = None
+        for name, provider, breaker in self.chain:
+            probe = breaker.state == CircuitBreaker.HALF_OPEN
+            if not breaker.allow():
+                continue
+            try:
+                call = provider.generate(system_prompt, user_prompt)
+                out = await (asyncio.wait_for(call, breaker.probe_timeout) if probe else call)
+            except Exception as e:
+                if not is_outage(e):
+                    # Bad request or local bug: another model won't fix it
+                    if probe:
+                        breaker.release_probe()
+                    raise
+                breaker.record_failure(probe)
+                logger.warning("model %s unavailable (%s: %s); trying next in chain", name, type(e).__name__, e)
+                last_exc = e
+                continue
+            except BaseException:
+                # Cancelled (hedge loser, shutdown): not the model's fault
+                if probe:
+                    breaker.release_probe()
+                raise
+            breaker.record_success(probe)
+            return out
+        if last_exc is not None:
+            raise last_exc
+        raise RuntimeError("all models in the failover chain have open circuit breakers")
@@ -1,14 +1,140 @@
+from __future__ import annotations
 import asyncio
+import time
 from collections import deque
+from typing import Any, Optional
+from . import storage
+
+_CLOSED = object()
+
 
 class TaskQueue:
-    def __init__(self):
-        self.queue = deque()
+    """Bounded in-memory buffer between one producer and many consumers.
+
+    ``add`` blocks while the buffer is full and ``get`` blocks while it is
+    empty; neither polls. After ``close`` consumers drain what is left and
+    then receive None.
+    """
+
+    def __init__(self, maxsize: int = 64, window: int = 256):
+        self.maxsize = max(1, maxsize)
+        # One extra slot so close() can always post its sentinel
+        self._q: asyncio.Queue[Any] = asyncio.Queue(self.maxsize + 1)
+        self._space = asyncio.Event()
+        self._space.set()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._closed = False
+        self.in_flight = 0
+        self.added = 0
+        self.served = 0
+        self._item_waits: deque[float] = deque(maxlen=window)
+        self._consumer_waits: deque[float] = deque(maxlen=window)
+
+    def __len__(self) -> int:
+        return self._q.qsize() - (1 if self._closed and not self._q.empty() else 0)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def free_slots(self) -> int:
+        return max(0, self.maxsize - len(self))
+
+    async def wait_for_space(self) -> None:
+        await self._space.wait()
+
+    async def add(self, task: Any) -> None:
+        if self._closed:
+            raise RuntimeError("TaskQueue is closed")
+        await self.wait_for_space()
+        self._q.put_nowait((time.monotonic(), task))
+        self.added += 1
+        self._idle.clear()
+        if len(self) >= self.maxsize:
+            self._space.clear()
+
+    async def get(self) -> Optional[Any]:
+        started = time.monotonic()
+        entry = await self._q.get()
+        if entry is _CLOSED:
+            # Leave the sentinel for the next consumer
+            self._q.put_nowait(_CLOSED)
+            return None
+        now = time.monotonic()
+        self._consumer_waits.append(now - started)
+        self._item_waits.append(now - entry[0])
+        self.served += 1
+        self.in_flight += 1
+        self._space.set()
+        return entry[1]
+
+    def task_done(self) -> None:
+        self.in_flight -= 1
+        if self.in_flight <= 0 and self._q.empty():
+            self._idle.set()
+
+    async def wait_idle(self) -> None:
+        """Wait until the buffer is empty and every item handed out has been marked done."""
+        await self._idle.wait()
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self._q.put_nowait(_CLOSED)
+
+    def drain(self) -> list[Any]:
+        """Remove and return every buffered item (e.g. to un-claim them on shutdown)."""
+        items = []
+        while not self._q.empty():
+            entry = self._q.get_nowait()
+            if entry is not _CLOSED:
+                items.append(entry[1])
+        if self._closed:
+            self._q.put_nowait(_CLOSED)
+        self._space.set()
+        return items
+
+    def metrics(self) -> dict[str, float]:
+        def avg_ms(xs: deque[float]) -> float:
+            return round(1000 * sum(xs) / len(xs), 2) if xs else 0.0
+
+        depth = len(self)
+        return {
+            "depth": depth,
+            "maxsize": self.maxsize,
+            "fill_ratio": round(depth / self.maxsize, 3),
+            "in_flight": self.in_flight,
+            "added": self.added,
+            "served": self.served,
+            "item_wait_ms_avg": avg_ms(self._item_waits),
+            "consumer_wait_ms_avg": avg_ms(self._consumer_waits),
+        }
+
 
-    async def add(self, task):
-        self.queue.append(task)
+async def prefetch(queue: TaskQueue, continuous: bool = False, max_idle_sleep: float = 1.0) -> None:
+    """Keep ``queue`` topped up with tasks claimed from storage.
 
-    async def get(self):
-        while not self.queue:
-            await asyncio.sleep(0.1)
-        return self.queue.popleft()
+    Tasks are only claimed while the buffer has room, in one batch per
+    round, so nothing sits claimed in memory beyond the buffer size. Without
+    ``continuous`` the queue is closed once storage has nothing claimable
+    and all handed-out work is done.
+    """
+    idle_sleep = 0.05
+    while True:
+        await queue.wait_for_space()
+        items = await storage.acquire_tasks(queue.free_slots())
+        if items:
+            idle_sleep = 0.05
+            for item in items:
+                await queue.add(item)
+            continue
+        if not continuous and len(queue) == 0 and queue.in_flight == 0:
+            queue.close()
+            return
+        if not continuous:
+            # Running tasks may still unlock more work; re-check once they finish
+            await queue.wait_idle()
+            continue
+        await asyncio.sleep(idle_sleep)
+        idle_sleep = min(idle_sleep * 2, max_idle_sleep)
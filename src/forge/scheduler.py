@@ -1,8 +1,13 @@
 from __future__ import annotations
 import asyncio
 import datetime as dt
-from typing import Awaitable, Callable
+import heapq
+import logging
+from typing import Awaitable, Callable, Optional
 from . import storage
+from .cron import Cron
+
+logger = logging.getLogger("scheduler")
 
 
 async def schedule_task(task_fn: Callable[[], Awaitable[object]], run_at: dt.datetime):
@@ -11,11 +16,66 @@ async def schedule_task(task_fn: Callable[[], Awaitable[object]], run_at: dt.dat
     return await task_fn()
 
 
+class ScheduleHeap:
+    """Min-heap of upcoming schedule runs keyed by run time (UTC)."""
+
+    def __init__(self) -> None:
+        self._heap: list[tuple[dt.datetime, int, str, Optional[Cron]]] = []
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    async def load(self) -> None:
+        entries = []
+        for sched_id, _task, run_at, cron in await storage.pending_schedules():
+            try:
+                when = dt.datetime.fromisoformat(run_at)
+                if when.tzinfo is not None:
+                    when = when.astimezone(dt.timezone.utc).replace(tzinfo=None)
+                entries.append((when, sched_id, run_at, Cron(cron) if cron else None))
+            except ValueError as e:
+                logger.warning("skipping schedule %s: %s", sched_id, e)
+        heapq.heapify(entries)
+        self._heap = entries
+
+    def next_due(self) -> Optional[dt.datetime]:
+        return self._heap[0][0] if self._heap else None
+
+    async def fire_due(self, now: dt.datetime) -> int:
+        """Promote every entry due at ``now``; returns how many schedule rows changed."""
+        changed = 0
+        while self._heap and self._heap[0][0] <= now:
+            _when, sched_id, run_at_iso, cron = heapq.heappop(self._heap)
+            next_run = cron.next_after(now) if cron else None
+            next_iso = next_run.isoformat() if next_run else None
+            task_id = await storage.promote_schedule(sched_id, run_at_iso, next_iso)
+            if task_id is None:
+                # Someone else promoted or edited it; a reload will pick up the new state
+                continue
+            changed += 1
+            logger.info("schedule %s enqueued task %s", sched_id, task_id)
+            if next_run and next_iso:
+                heapq.heappush(self._heap, (next_run, sched_id, next_iso, cron))
+        return changed
+
+
 async def run_scheduler(poll_interval: float = 1.0) -> None:
+    """Sleep until the next schedule is due, reloading when schedules change.
+
+    ``poll_interval`` bounds how long a newly added schedule can go unnoticed;
+    checking for changes reads a single version counter, not the schedules table.
+    """
     await storage.init_db()
+    heap = ScheduleHeap()
+    version: Optional[int] = None
     while True:
-        now_iso = dt.datetime.utcnow().isoformat()
-        for sched_id, task in await storage.due_schedules(now_iso):
-            await storage.enqueue_task(task)
-            await storage.mark_schedule_done(sched_id)
-        await asyncio.sleep(poll_interval)
+        current = await storage.schedules_version()
+        if current != version:
+            await heap.load()
+            version = current
+        now = dt.datetime.utcnow()
+        # Each promotion bumps the version once; only reload if someone else changed things too
+        version += await heap.fire_due(now)
+        nxt = heap.next_due()
+        delay = poll_interval if nxt is None else min(poll_interval, (nxt - now).total_seconds())
+        await asyncio.sleep(max(0.0, delay))
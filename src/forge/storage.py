@@ -4,7 +4,7 @@ import contextlib
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Optional, Sequence
-from datetime import datetime
+from datetime import datetime, timedelta
 import aiosqlite
 
 DB_PATH = Path("forge.db").resolve()
@@ -33,6 +33,58 @@ async def init_db() -> None:
             )
             """
         )
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status_id ON tasks(status, id)")
+        await _ensure_column(db, "tasks", "queue", "TEXT NOT NULL DEFAULT 'default'")
+        await _ensure_column(db, "tasks", "output", "TEXT")
+        await _ensure_column(db, "tasks", "schedule_id", "INTEGER")
+        # Dependency edges: a parent (join) task runs only after all its children are done
+        await db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS task_children (
+              parent_id INTEGER NOT NULL REFERENCES tasks(id),
+              child_id INTEGER NOT NULL REFERENCES tasks(id),
+              PRIMARY KEY (parent_id, child_id)
+            )
+            """
+        )
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_task_children_child ON task_children(child_id)")
+        await db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS usage (
+              id INTEGER PRIMARY KEY AUTOINCREMENT,
+              task_id INTEGER,
+              model TEXT NOT NULL,
+              queue TEXT NOT NULL DEFAULT 'default',
+              input_tokens INTEGER NOT NULL DEFAULT 0,
+              output_tokens INTEGER NOT NULL DEFAULT 0,
+              cache_read_tokens INTEGER NOT NULL DEFAULT 0,
+              cache_creation_tokens INTEGER NOT NULL DEFAULT 0,
+              latency_ms REAL NOT NULL DEFAULT 0,
+              cost_usd REAL NOT NULL DEFAULT 0,
+              created_at TEXT NOT NULL
+            )
+            """
+        )
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_usage_created_at ON usage(created_at)")
+        await _ensure_column(db, "schedules", "cron", "TEXT")
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_schedules_status_run_at ON schedules(status, run_at)"
+        )
+        # Bumped by triggers on every schedule change so the scheduler can cheaply detect edits
+        await db.execute(
+            "CREATE TABLE IF NOT EXISTS schedule_version (id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL)"
+        )
+        await db.execute("INSERT OR IGNORE INTO schedule_version (id, version) VALUES (1, 0)")
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            await db.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS schedules_version_{event.lower()}
+                AFTER {event} ON schedules
+                BEGIN
+                  UPDATE schedule_version SET version = version + 1 WHERE id = 1;
+                END
+                """
+            )
         await db.execute(
             """
             CREATE TABLE IF NOT EXISTS todos (
@@ -46,12 +98,18 @@ async def init_db() -> None:
         await db.commit()
 
 
-async def enqueue_task(payload: str) -> int:
+async def _ensure_column(db: aiosqlite.Connection, table: str, column: str, decl: str) -> None:
+    cur = await db.execute(f"PRAGMA table_info({table})")
+    if column not in {row[1] for row in await cur.fetchall()}:
+        await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+async def enqueue_task(payload: str, queue: str = "default") -> int:
     now = datetime.utcnow().isoformat()
     async with aiosqlite.connect(DB_PATH) as db:
         cur = await db.execute(
-            "INSERT INTO tasks (payload, status, created_at, updated_at) VALUES (?, 'queued', ?, ?)",
-            (payload, now, now),
+            "INSERT INTO tasks (payload, status, created_at, updated_at, queue) VALUES (?, 'queued', ?, ?, ?)",
+            (payload, now, now, queue),
         )
         await db.commit()
         return cur.lastrowid
@@ -66,31 +124,76 @@ async def list_tasks(limit: int = 50) -> Sequence[tuple[int, str, str, str, str]
         return await cur.fetchall()
 
 
-async def acquire_next_task() -> Optional[tuple[int, str]]:
+async def list_task_previews(limit: int = 50, chars: int = 200) -> Sequence[tuple[int, str, str]]:
+    """(id, first ``chars`` of payload, status), newest first; avoids loading whole payloads."""
+    async with aiosqlite.connect(DB_PATH) as db:
+        cur = await db.execute(
+            "SELECT id, substr(payload, 1, ?), status FROM tasks ORDER BY id DESC LIMIT ?",
+            (chars, limit),
+        )
+        return await cur.fetchall()
+
+
+async def task_counts() -> dict[str, int]:
+    async with aiosqlite.connect(DB_PATH) as db:
+        cur = await db.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status")
+        return {status: count for status, count in await cur.fetchall()}
+
+
+async def acquire_tasks(limit: int) -> list[tuple[int, str, Optional[int], bool]]:
+    """Claim up to ``limit`` queued tasks in one transaction as (id, payload, schedule_id, is_join)."""
+    if limit <= 0:
+        return []
     async with aiosqlite.connect(DB_PATH) as db:
         await db.execute("BEGIN IMMEDIATE")
         cur = await db.execute(
-            "SELECT id, payload FROM tasks WHERE status='queued' ORDER BY id LIMIT 1"
+            "SELECT id, payload, schedule_id, EXISTS (SELECT 1 FROM task_children e WHERE e.parent_id = tasks.id) "
+            "FROM tasks WHERE status='queued' ORDER BY id LIMIT ?",
+            (limit,),
         )
-        row = await cur.fetchone()
-        if not row:
-            await db.execute("COMMIT")
-            return None
-        task_id, payload = row
+        rows = [(r[0], r[1], r[2], bool(r[3])) for r in await cur.fetchall()]
+        if rows:
+            now = datetime.utcnow().isoformat()
+            await db.executemany(
+                "UPDATE tasks SET status='in_progress', updated_at=? WHERE id=? AND status='queued'",
+                [(now, row[0]) for row in rows],
+            )
+        await db.commit()
+        return rows
+
+
+async def release_tasks(task_ids: Sequence[int]) -> None:
+    """Return claimed-but-unstarted tasks to the queue."""
+    if not task_ids:
+        return
+    async with aiosqlite.connect(DB_PATH) as db:
         now = datetime.utcnow().isoformat()
-        await db.execute(
-            "UPDATE tasks SET status='in_progress', updated_at=? WHERE id=? AND status='queued'",
-            (now, task_id),
+        await db.executemany(
+            "UPDATE tasks SET status='queued', updated_at=? WHERE id=? AND status='in_progress'",
+            [(now, task_id) for task_id in task_ids],
         )
         await db.commit()
-        return task_id, payload
 
 
-async def complete_task(task_id: int) -> None:
+async def complete_task(task_id: int, output: Optional[str] = None) -> None:
     async with aiosqlite.connect(DB_PATH) as db:
+        await db.execute("BEGIN IMMEDIATE")
         now = datetime.utcnow().isoformat()
         await db.execute(
-            "UPDATE tasks SET status='done', updated_at=? WHERE id=?",
+            "UPDATE tasks SET status='done', output=COALESCE(?, output), updated_at=? WHERE id=?",
+            (output, now, task_id),
+        )
+        # A sealed join becomes claimable once its last child is done
+        await db.execute(
+            """
+            UPDATE tasks SET status='queued', updated_at=?
+            WHERE status='blocked'
+              AND id IN (SELECT parent_id FROM task_children WHERE child_id=?)
+              AND NOT EXISTS (
+                SELECT 1 FROM task_children e JOIN tasks c ON c.id = e.child_id
+                WHERE e.parent_id = tasks.id AND c.status != 'done'
+              )
+            """,
             (now, task_id),
         )
         await db.commit()
@@ -98,35 +201,279 @@ async def complete_task(task_id: int) -> None:
 
 async def fail_task(task_id: int) -> None:
     async with aiosqlite.connect(DB_PATH) as db:
+        await db.execute("BEGIN IMMEDIATE")
         now = datetime.utcnow().isoformat()
         await db.execute(
             "UPDATE tasks SET status='failed', updated_at=? WHERE id=?",
             (now, task_id),
         )
+        # Joins waiting on a failed child can never run; fail them and their ancestors
+        await db.execute(
+            """
+            WITH RECURSIVE ancestors(id) AS (
+              SELECT parent_id FROM task_children WHERE child_id=?
+              UNION SELECT e.parent_id FROM task_children e JOIN ancestors a ON e.child_id = a.id
+            )
+            UPDATE tasks SET status='failed', updated_at=?
+            WHERE id IN (SELECT id FROM ancestors) AND status IN ('pending', 'blocked')
+            """,
+            (task_id, now),
+        )
         await db.commit()
 
 
-async def add_schedule(task: str, run_at_iso: str) -> int:
+async def create_join(payload: str, queue: str = "default") -> int:
+    """Create a join task that stays 'pending' until seal_join; children are added in between."""
+    now = datetime.utcnow().isoformat()
     async with aiosqlite.connect(DB_PATH) as db:
         cur = await db.execute(
-            "INSERT INTO schedules (task, run_at, status) VALUES (?, ?, 'scheduled')",
-            (task, run_at_iso),
+            "INSERT INTO tasks (payload, status, created_at, updated_at, queue) VALUES (?, 'pending', ?, ?, ?)",
+            (payload, now, now, queue),
         )
         await db.commit()
         return cur.lastrowid
 
 
-async def due_schedules(now_iso: Optional[str] = None) -> Sequence[tuple[int, str]]:
-    now_iso = now_iso or datetime.utcnow().isoformat()
+async def _insert_children(
+    db: aiosqlite.Connection, parent_id: int, payloads: Sequence[str], queue: str, now: str
+) -> list[int]:
+    ids = []
+    for payload in payloads:
+        cur = await db.execute(
+            "INSERT INTO tasks (payload, status, created_at, updated_at, queue) VALUES (?, 'queued', ?, ?, ?)",
+            (payload, now, now, queue),
+        )
+        assert cur.lastrowid is not None
+        ids.append(cur.lastrowid)
+    await db.executemany(
+        "INSERT INTO task_children (parent_id, child_id) VALUES (?, ?)", [(parent_id, c) for c in ids]
+    )
+    # Keeps an open join from looking orphaned while a long input is still streaming in
+    await db.execute("UPDATE tasks SET updated_at=? WHERE id=?", (now, parent_id))
+    return ids
+
+
+async def _seal(db: aiosqlite.Connection, parent_id: int, now: str) -> str:
+    cur = await db.execute(
+        "SELECT COUNT(*), SUM(c.status = 'done'), SUM(c.status = 'failed') "
+        "FROM task_children e JOIN tasks c ON c.id = e.child_id WHERE e.parent_id=?",
+        (parent_id,),
+    )
+    row = await cur.fetchone()
+    total, done, failed = row if row else (0, 0, 0)
+    status = "failed" if failed else "queued" if total == (done or 0) else "blocked"
+    await db.execute(
+        "UPDATE tasks SET status=?, updated_at=? WHERE id=? AND status='pending'",
+        (status, now, parent_id),
+    )
+    return status
+
+
+async def add_children(parent_id: int, payloads: Sequence[str], queue: str = "default") -> list[int]:
+    """Enqueue ``payloads`` as children of ``parent_id`` in one transaction."""
     async with aiosqlite.connect(DB_PATH) as db:
+        await db.execute("BEGIN IMMEDIATE")
+        ids = await _insert_children(db, parent_id, payloads, queue, datetime.utcnow().isoformat())
+        await db.commit()
+    return ids
+
+
+async def enqueue_fan_out(join_payload: str, payloads: Sequence[str], queue: str = "default") -> tuple[int, list[int]]:
+    """Create a join, its children and seal it in one transaction; returns (join_id, child_ids)."""
+    now = datetime.utcnow().isoformat()
+    async with aiosqlite.connect(DB_PATH) as db:
+        await db.execute("BEGIN IMMEDIATE")
         cur = await db.execute(
-            "SELECT id, task FROM schedules WHERE status='scheduled' AND run_at <= ?",
-            (now_iso,),
+            "INSERT INTO tasks (payload, status, created_at, updated_at, queue) VALUES (?, 'pending', ?, ?, ?)",
+            (join_payload, now, now, queue),
+        )
+        join_id = cur.lastrowid
+        assert join_id is not None
+        ids = await _insert_children(db, join_id, payloads, queue, now)
+        await _seal(db, join_id, now)
+        await db.commit()
+    return join_id, ids
+
+
+async def link_child(parent_id: int, child_id: int) -> None:
+    async with aiosqlite.connect(DB_PATH) as db:
+        await db.execute(
+            "INSERT OR IGNORE INTO task_children (parent_id, child_id) VALUES (?, ?)", (parent_id, child_id)
+        )
+        await db.execute("UPDATE tasks SET updated_at=? WHERE id=?", (datetime.utcnow().isoformat(), parent_id))
+        await db.commit()
+
+
+async def seal_join(parent_id: int) -> str:
+    """Stop accepting children; the join is queued now if they're all done, else 'blocked'."""
+    async with aiosqlite.connect(DB_PATH) as db:
+        await db.execute("BEGIN IMMEDIATE")
+        status = await _seal(db, parent_id, datetime.utcnow().isoformat())
+        await db.commit()
+        return status
+
+
+async def abandon_joins(join_ids: Sequence[int]) -> int:
+    """Fail unsealed joins and every task beneath them that has not started yet.
+
+    Used when building a DAG is interrupted: its reduce could never run, so
+    the queued work under it would only burn tokens. Returns the number of
+    tasks failed.
+    """
+    if not join_ids:
+        return 0
+    marks = ",".join("?" * len(join_ids))
+    async with aiosqlite.connect(DB_PATH) as db:
+        await db.execute("BEGIN IMMEDIATE")
+        before = db.total_changes
+        await db.execute(
+            f"""
+            WITH RECURSIVE tree(id) AS (
+              SELECT id FROM tasks WHERE id IN ({marks})
+              UNION SELECT e.child_id FROM task_children e JOIN tree t ON e.parent_id = t.id
+            )
+            UPDATE tasks SET status='failed', updated_at=?
+            WHERE id IN (SELECT id FROM tree) AND status IN ('pending', 'blocked', 'queued')
+            """,
+            (*join_ids, datetime.utcnow().isoformat()),
+        )
+        # rowcount is not reported for a CTE-driven UPDATE
+        failed = db.total_changes - before
+        await db.commit()
+        return failed
+
+
+async def sweep_orphaned_joins(max_age_seconds: float = 3600.0) -> int:
+    """Abandon joins left 'pending' (never sealed) for longer than ``max_age_seconds``.
+
+    Catches DAG builders that died without cleaning up (e.g. the process was killed).
+    """
+    cutoff = (datetime.utcnow() - timedelta(seconds=max_age_seconds)).isoformat()
+    async with aiosqlite.connect(DB_PATH) as db:
+        cur = await db.execute("SELECT id FROM tasks WHERE status='pending' AND updated_at < ?", (cutoff,))
+        ids = [r[0] for r in await cur.fetchall()]
+    return await abandon_joins(ids)
+
+
+async def child_outputs(parent_id: int) -> Sequence[tuple[int, Optional[str]]]:
+    async with aiosqlite.connect(DB_PATH) as db:
+        cur = await db.execute(
+            "SELECT c.id, c.output FROM task_children e JOIN tasks c ON c.id = e.child_id "
+            "WHERE e.parent_id=? ORDER BY c.id",
+            (parent_id,),
+        )
+        return await cur.fetchall()
+
+
+async def add_schedule(task: str, run_at_iso: str, cron: Optional[str] = None) -> int:
+    async with aiosqlite.connect(DB_PATH) as db:
+        cur = await db.execute(
+            "INSERT INTO schedules (task, run_at, status, cron) VALUES (?, ?, 'scheduled', ?)",
+            (task, run_at_iso, cron),
+        )
+        await db.commit()
+        return cur.lastrowid
+
+
+async def pending_schedules() -> Sequence[tuple[int, str, str, Optional[str]]]:
+    async with aiosqlite.connect(DB_PATH) as db:
+        cur = await db.execute(
+            "SELECT id, task, run_at, cron FROM schedules WHERE status='scheduled'"
         )
         return await cur.fetchall()
 
 
-async def mark_schedule_done(sched_id: int) -> None:
+async def schedules_version() -> int:
     async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("UPDATE schedules SET status='done' WHERE id=?", (sched_id,))
+        cur = await db.execute("SELECT version FROM schedule_version WHERE id = 1")
+        row = await cur.fetchone()
+        return row[0] if row else 0
+
+
+async def promote_schedule(sched_id: int, run_at_iso: str, next_run_iso: Optional[str] = None) -> Optional[int]:
+    """Enqueue a due schedule and retire or re-arm it in a single transaction.
+
+    Returns the new task id, or None if the schedule was already promoted
+    (or edited) since ``run_at_iso`` was read.
+    """
+    now = datetime.utcnow().isoformat()
+    async with aiosqlite.connect(DB_PATH) as db:
+        await db.execute("BEGIN IMMEDIATE")
+        if next_run_iso is None:
+            cur = await db.execute(
+                "UPDATE schedules SET status='done' WHERE id=? AND status='scheduled' AND run_at=?",
+                (sched_id, run_at_iso),
+            )
+        else:
+            cur = await db.execute(
+                "UPDATE schedules SET run_at=? WHERE id=? AND status='scheduled' AND run_at=?",
+                (next_run_iso, sched_id, run_at_iso),
+            )
+        if cur.rowcount == 0:
+            await db.rollback()
+            return None
+        cur = await db.execute(
+            "INSERT INTO tasks (payload, status, created_at, updated_at, schedule_id) "
+            "SELECT task, 'queued', ?, ?, id FROM schedules WHERE id=?",
+            (now, now, sched_id),
+        )
+        await db.commit()
+        return cur.lastrowid
+
+
+async def record_usage(
+    task_id: Optional[int],
+    rows: Sequence[tuple[str, int, int, int, int, float, float]],
+) -> None:
+    """Store per-call usage: (model, input, output, cache_read, cache_creation, latency_ms, cost_usd)."""
+    if not rows:
+        return
+    now = datetime.utcnow().isoformat()
+    async with aiosqlite.connect(DB_PATH) as db:
+        cur = await db.execute("SELECT queue FROM tasks WHERE id=?", (task_id,))
+        row = await cur.fetchone()
+        queue = row[0] if row else "default"
+        await db.executemany(
+            "INSERT INTO usage (task_id, model, queue, input_tokens, output_tokens, cache_read_tokens, "
+            "cache_creation_tokens, latency_ms, cost_usd, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(task_id, r[0], queue, *r[1:7], now) for r in rows],
+        )
         await db.commit()
+
+
+async def usage_totals(since_iso: str) -> tuple[int, float]:
+    """Total tokens and USD recorded since ``since_iso``."""
+    async with aiosqlite.connect(DB_PATH) as db:
+        cur = await db.execute(
+            "SELECT COALESCE(SUM(input_tokens + output_tokens + cache_read_tokens + cache_creation_tokens), 0), "
+            "COALESCE(SUM(cost_usd), 0) FROM usage WHERE created_at >= ?",
+            (since_iso,),
+        )
+        row = await cur.fetchone()
+        tokens, cost = row if row else (0, 0.0)
+        return int(tokens), float(cost)
+
+
+_USAGE_GROUPS = {
+    "model": "model",
+    "queue": "queue",
+    "hour": "substr(created_at, 1, 13)",
+    "task": "task_id",
+}
+
+
+async def usage_report(by: str = "model", since_iso: Optional[str] = None) -> Sequence[tuple]:
+    """Rows of (key, calls, tasks, input, output, cache_read, cache_creation, cost_usd, avg_latency_ms)."""
+    if by not in _USAGE_GROUPS:
+        raise ValueError(f"unknown usage grouping: {by}")
+    key = _USAGE_GROUPS[by]
+    async with aiosqlite.connect(DB_PATH) as db:
+        cur = await db.execute(
+            f"""
+            SELECT {key}, COUNT(*), COUNT(DISTINCT task_id), SUM(input_tokens), SUM(output_tokens),
+                   SUM(cache_read_tokens), SUM(cache_creation_tokens), SUM(cost_usd), AVG(latency_ms)
+            FROM usage WHERE created_at >= ? GROUP BY 1 ORDER BY 1
+            """,
+            (since_iso or "",),
+        )
+        return await cur.fetchall()
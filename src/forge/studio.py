@@ -1,6 +1,9 @@
 from __future__ import annotations
 import asyncio
-from typing import List
+import bisect
+import time
+from collections import OrderedDict, deque
+from typing import Optional
 from prompt_toolkit.application import Application
 from prompt_toolkit.key_binding import KeyBindings
 from prompt_toolkit.layout import Layout, HSplit
@@ -9,64 +12,225 @@ from prompt_toolkit.layout.containers import Window
 from prompt_toolkit.widgets import TextArea
 from prompt_toolkit.styles import Style
 from . import storage
-
-
-async def _fetch_tasks_text(limit: int = 20) -> str:
-    rows = await storage.list_tasks(limit)
-    lines = ["ID  STATUS        PAYLOAD"]
-    for r in rows:
-        rid, payload, status, created, updated = r
-        lines.append(f"{rid:<3} {status:<12} {payload}")
-    return "\n".join(lines)
-
-
-def launch_studio(concurrency: int, runner_coro_factory, enqueue_fn):
+from .events import PREVIEW_CHARS, TaskEvent, bus, preview
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+WORKER_CHARS = {"idle": ".", "running": "#", "stopped": " "}
+OUTPUT_TAIL_CHARS = 4000
+# Streamed output is kept for this many recent tasks (plus the selected one)
+OUTPUT_TASKS = 200
+
+
+class StudioState:
+    """Everything the studio renders, updated incrementally from runner events.
+
+    Tasks are kept in a dict plus a sorted id list so the task pane only
+    formats the rows currently on screen, whatever the total count.
+    """
+
+    def __init__(self, spark_seconds: int = 60, output_tasks: int = OUTPUT_TASKS):
+        self.tasks: dict[int, list[str]] = {}
+        self.order: list[int] = []
+        self.workers: dict[int, str] = {}
+        self.outputs: OrderedDict[int, str] = OrderedDict()
+        self.output_tasks = max(1, output_tasks)
+        self.queue_metrics: dict[str, float] = {}
+        self.cursor = 0  # rows from the newest task
+        self.completions: deque[int] = deque([0] * spark_seconds, maxlen=spark_seconds)
+        self._bucket_start = int(time.time())
+
+    def upsert_task(self, task_id: int, status: str, payload: Optional[str] = None) -> None:
+        payload = preview(payload)
+        row = self.tasks.get(task_id)
+        if row is None:
+            self.tasks[task_id] = [status, payload]
+            if not self.order or task_id > self.order[-1]:
+                self.order.append(task_id)
+            else:
+                bisect.insort(self.order, task_id)
+            if self.cursor:
+                # Keep the selected row steady while new tasks arrive above it
+                self.cursor += 1
+            return
+        row[0] = status
+        if payload and not row[1]:
+            row[1] = payload
+
+    def _tick(self, now: float) -> None:
+        sec = int(now)
+        gap = sec - self._bucket_start
+        if gap > 0:
+            self.completions.extend([0] * min(gap, self.completions.maxlen or gap))
+            self._bucket_start = sec
+
+    def apply(self, ev: TaskEvent) -> None:
+        if ev.kind == "worker" and ev.worker_id is not None:
+            self.workers[ev.worker_id] = ev.status or "idle"
+        elif ev.kind == "task" and ev.task_id is not None:
+            payload = ev.text if ev.status == "in_progress" else None
+            self.upsert_task(ev.task_id, ev.status or "", payload)
+            if ev.status in ("done", "failed"):
+                self._tick(ev.ts)
+                self.completions[-1] += 1
+        elif ev.kind == "queue" and ev.data:
+            self.queue_metrics = ev.data
+        elif ev.kind == "output" and ev.task_id is not None and ev.text:
+            buf = self.outputs.pop(ev.task_id, "") + ev.text
+            self.outputs[ev.task_id] = buf[-OUTPUT_TAIL_CHARS:]
+            selected = self.selected()
+            while len(self.outputs) > self.output_tasks:
+                oldest = next(iter(self.outputs))
+                if oldest == selected:
+                    self.outputs.move_to_end(oldest)
+                    continue
+                del self.outputs[oldest]
+
+    def move(self, delta: int) -> None:
+        self.cursor = max(0, min(len(self.order) - 1, self.cursor + delta))
+
+    def selected(self) -> Optional[int]:
+        if not self.order:
+            return None
+        return self.order[len(self.order) - 1 - self.cursor]
+
+    def visible_rows(self, height: int) -> list[tuple[bool, int, str, str]]:
+        """Rows for a window of ``height`` lines, newest first, keeping the cursor in view."""
+        n = len(self.order)
+        if n == 0 or height <= 0:
+            return []
+        top = max(0, min(self.cursor - height // 2, n - height))
+        rows = []
+        for i in range(top, min(n, top + height)):
+            tid = self.order[n - 1 - i]
+            status, payload = self.tasks[tid]
+            rows.append((i == self.cursor, tid, status, payload))
+        return rows
+
+    def sparkline(self, now: Optional[float] = None) -> str:
+        self._tick(now or time.time())
+        peak = max(self.completions) or 1
+        return "".join(SPARK_CHARS[c * (len(SPARK_CHARS) - 1) // peak] for c in self.completions)
+
+    def worker_grid(self, width: int) -> list[str]:
+        if not self.workers:
+            return ["(no workers)"]
+        cells = "".join(WORKER_CHARS.get(self.workers[w], "?") for w in sorted(self.workers))
+        width = max(10, width)
+        return [cells[i : i + width] for i in range(0, len(cells), width)]
+
+
+def launch_studio(concurrency: int, runner_coro_factory, enqueue_fn, snapshot_limit: int = 100_000):
     kb = KeyBindings()
+    state = StudioState()
+
+    def _task_lines():
+        height = task_window.render_info.window_height if task_window.render_info else 20
+        lines: list[tuple[str, str]] = [("class:header", f"{'ID':<8} {'STATUS':<12} PAYLOAD  ({len(state.order)} tasks)\n")]
+        for selected, tid, status, payload in state.visible_rows(height - 1):
+            style = "class:selected" if selected else f"class:status.{status}"
+            lines.append((style, f"{tid:<8} {status:<12} {payload}\n"))
+        return lines
+
+    def _status_lines():
+        running = sum(1 for s in state.workers.values() if s == "running")
+        width = status_window.render_info.window_width if status_window.render_info else 80
+        grid = state.worker_grid(width)
+        m = state.queue_metrics
+        buffered = f"  buffer {m['depth']}/{m['maxsize']}" if m else ""
+        head = f"workers {running}/{len(state.workers)} running{buffered}  throughput/s {state.sparkline()}\n"
+        return head + "\n".join(grid[:4])
+
+    def _output_lines():
+        tid = state.selected()
+        if tid is None:
+            return ""
+        height = output_window.render_info.window_height if output_window.render_info else 8
+        return "\n".join(state.outputs.get(tid, "").splitlines()[-height:])
+
+    task_window = Window(content=FormattedTextControl(_task_lines), wrap_lines=False)
+    status_window = Window(content=FormattedTextControl(_status_lines), height=5, wrap_lines=False)
+    output_window = Window(content=FormattedTextControl(_output_lines), height=8, wrap_lines=False)
+
+    async def _enqueue(text: str):
+        task_id = await enqueue_fn(text)
+        if task_id is not None:
+            state.upsert_task(task_id, "queued", text)
+            app.invalidate()
 
-    output_control = FormattedTextControl(text="Loading...")
-    output_window = Window(content=output_control, wrap_lines=False, height=20)
-
-    input_area = TextArea(height=3, prompt="Task> ", multiline=False)
-
-    @input_area.accept_handler
-    def accept(buff):
+    def accept(buff) -> bool:
         text = buff.text.strip()
         if text:
-            asyncio.get_event_loop().create_task(enqueue_fn(text))
-        buff.text = ""
+            asyncio.get_event_loop().create_task(_enqueue(text))
+        return False  # clear the input
+
+    input_area = TextArea(height=3, prompt="Task> ", multiline=False, accept_handler=accept)
 
     @kb.add("c-c")
     @kb.add("c-q")
     def _(event):
         event.app.exit()
 
+    for key, delta in (("up", -1), ("down", 1), ("pageup", -20), ("pagedown", 20)):
+        # eager: take arrows from the input box, which would otherwise use them for history
+        kb.add(key, eager=True)(lambda event, d=delta: state.move(d))
+    kb.add("home", eager=True)(lambda event: state.move(-len(state.order)))
+    kb.add("end", eager=True)(lambda event: state.move(len(state.order)))
+
     root = HSplit([
-        Window(height=1, content=FormattedTextControl("AgentForge Studio (Ctrl+C to exit)")),
+        Window(height=1, content=FormattedTextControl("AgentForge Studio (Ctrl+C to exit, arrows/PgUp/PgDn to scroll)")),
+        status_window,
+        task_window,
+        Window(height=1, char="-", style="class:rule"),
         output_window,
         input_area,
     ])
 
-    style = Style.from_dict({"window.border": "#666666"})
-
-    app = Application(layout=Layout(root), key_bindings=kb, full_screen=True, style=style)
-
-    async def updater():
+    style = Style.from_dict({
+        "window.border": "#666666",
+        "header": "bold",
+        "selected": "reverse",
+        "status.done": "#44aa44",
+        "status.failed": "#cc4444",
+        "status.in_progress": "#ccaa22",
+        "rule": "#666666",
+    })
+
+    # Redraws are coalesced so a burst of events costs at most one render per interval
+    app: Application[None] = Application(
+        layout=Layout(root, focused_element=input_area),
+        key_bindings=kb,
+        full_screen=True,
+        style=style,
+        min_redraw_interval=0.1,
+    )
+
+    events = bus.subscribe()
+
+    async def consume():
         while True:
-            txt = await _fetch_tasks_text()
-            output_control.text = txt
+            state.apply(await events.get())
+            while not events.empty():
+                state.apply(events.get_nowait())
             app.invalidate()
-            await asyncio.sleep(1.0)
 
-    async def enqueue_task(payload: str):
-        await storage.enqueue_task(payload)
-
-    loop = asyncio.get_event_loop()
+    async def spark_clock():
+        # Only shifts the sparkline window; no DB access
+        while True:
+            await asyncio.sleep(1.0)
+            app.invalidate()
 
     async def main_async():
         await storage.init_db()
-        # Start continuous runner
-        loop.create_task(runner_coro_factory())
-        loop.create_task(updater())
-        await app.run_async()
+        # One-time snapshot so tasks queued before launch are listed; later changes arrive as events
+        for rid, payload, status in reversed(await storage.list_task_previews(snapshot_limit, PREVIEW_CHARS)):
+            state.upsert_task(rid, status, payload)
+        runner = asyncio.create_task(runner_coro_factory())
+        background = [asyncio.create_task(consume()), asyncio.create_task(spark_clock())]
+        try:
+            await app.run_async()
+        finally:
+            bus.unsubscribe(events)
+            for t in [runner, *background]:
+                t.cancel()
 
     asyncio.run(main_async())
@@ -0,0 +1,185 @@
+from __future__ import annotations
+import asyncio
+import contextlib
+import datetime as dt
+import logging
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional
+from . import storage
+
+logger = logging.getLogger("runner")
+
+# USD per million tokens: input, output, cache write, cache read. Matched by substring of the
+# model name; override or extend with `pricing` in config.yaml.
+DEFAULT_PRICES: dict[str, dict[str, float]] = {
+    "opus": {"input": 15.0, "output": 75.0, "cache_write": 18.75, "cache_read": 1.50},
+    "sonnet": {"input": 3.0, "output": 15.0, "cache_write": 3.75, "cache_read": 0.30},
+    "haiku": {"input": 0.80, "output": 4.0, "cache_write": 1.0, "cache_read": 0.08},
+}
+
+
+@dataclass
+class Usage:
+    model: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_tokens: int = 0
+    cache_creation_tokens: int = 0
+    latency_ms: float = 0.0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens + self.cache_read_tokens + self.cache_creation_tokens
+
+    def cost(self, prices: Optional[dict[str, dict[str, float]]] = None) -> float:
+        table = {**DEFAULT_PRICES, **(prices or {})}
+        name = self.model.lower()
+        # Exact name first, then the longest matching substring
+        price = table.get(name) or next((table[k] for k in sorted(table, key=len, reverse=True) if k in name), None)
+        if not price:
+            return 0.0
+        return (
+            self.input_tokens * price.get("input", 0.0)
+            + self.output_tokens * price.get("output", 0.0)
+            + self.cache_creation_tokens * price.get("cache_write", 0.0)
+            + self.cache_read_tokens * price.get("cache_read", 0.0)
+        ) / 1_000_000
+
+
+@dataclass
+class UsageRecorder:
+    records: list[Usage] = field(default_factory=list)
+
+
+_recorder: ContextVar[Optional[UsageRecorder]] = ContextVar("forge_usage_recorder", default=None)
+
+
+@contextlib.contextmanager
+def recording() -> Iterator[UsageRecorder]:
+    """Collect every provider call made in this context (including hedged duplicates)."""
+    rec = UsageRecorder()
+    token = _recorder.set(rec)
+    try:
+        yield rec
+    finally:
+        _recorder.reset(token)
+
+
+def record(usage: Usage) -> None:
+    rec = _recorder.get()
+    if rec is not None:
+        rec.records.append(usage)
+
+
+def window_start(window: str, now: Optional[dt.datetime] = None) -> dt.datetime:
+    now = now or dt.datetime.utcnow()
+    if window == "hour":
+        return now.replace(minute=0, second=0, microsecond=0)
+    return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class BudgetGuard:
+    """Throttle, then pause, provider calls as spend approaches a per-window budget.
+
+    Below ``slow_at`` of either budget calls pass straight through. Between
+    ``slow_at`` and the limit each call is delayed, up to ``max_delay``
+    seconds. Once spend plus the estimated cost of calls already in flight
+    would reach the limit, new calls wait until the window rolls over.
+    """
+
+    def __init__(
+        self,
+        max_usd: float = 0.0,
+        max_tokens: int = 0,
+        window: str = "day",
+        slow_at: float = 0.8,
+        max_delay: float = 5.0,
+        refresh_seconds: float = 5.0,
+    ):
+        self.max_usd = max_usd
+        self.max_tokens = max_tokens
+        self.window = window
+        self.slow_at = slow_at
+        self.max_delay = max_delay
+        self.refresh_seconds = refresh_seconds
+        self.in_flight = 0
+        self._spent_usd = 0.0
+        self._spent_tokens = 0
+        self._avg_usd = 0.0
+        self._avg_tokens = 0.0
+        self._refreshed_at = 0.0
+        self._window: Optional[dt.datetime] = None
+        self._paused = False
+        # One totals query per refresh period, however many workers ask at once
+        self._refresh_lock = asyncio.Lock()
+
+    @classmethod
+    def from_config(cls, cfg: dict[str, Any]) -> Optional["BudgetGuard"]:
+        b = cfg.get("budgets") or {}
+        max_usd, max_tokens = float(b.get("max_usd") or 0), int(b.get("max_tokens") or 0)
+        if not max_usd and not max_tokens:
+            return None
+        return cls(max_usd, max_tokens, b.get("window", "day"), float(b.get("slow_at", 0.8)), float(b.get("max_delay", 5.0)))
+
+    def _stale(self, start: dt.datetime) -> bool:
+        return start != self._window or time.monotonic() - self._refreshed_at >= self.refresh_seconds
+
+    async def _refresh(self) -> None:
+        start = window_start(self.window)
+        if not self._stale(start):
+            return
+        async with self._refresh_lock:
+            # Another worker may have refreshed while this one waited
+            if self._stale(start):
+                self._spent_tokens, self._spent_usd = await storage.usage_totals(start.isoformat())
+                self._window = start
+                self._refreshed_at = time.monotonic()
+
+    def fraction(self) -> float:
+        fracs = []
+        if self.max_usd:
+            fracs.append((self._spent_usd + self.in_flight * self._avg_usd) / self.max_usd)
+        if self.max_tokens:
+            fracs.append((self._spent_tokens + self.in_flight * self._avg_tokens) / self.max_tokens)
+        return max(fracs, default=0.0)
+
+    async def acquire(self) -> None:
+        """Wait for budget headroom and reserve it; pair every successful call with ``release``."""
+        while True:
+            await self._refresh()
+            # Count this call as in flight while deciding, so a burst can't overshoot together
+            self.in_flight += 1
+            frac = self.fraction()
+            if frac < 1.0:
+                break
+            self.in_flight -= 1
+            if not self._paused:
+                logger.warning("budget reached (%.0f%% of %s budget); pausing new calls", 100 * frac, self.window)
+                self._paused = True
+            assert self._window is not None
+            nxt = self._window + (dt.timedelta(hours=1) if self.window == "hour" else dt.timedelta(days=1))
+            await asyncio.sleep(max(0.5, min(self.refresh_seconds, (nxt - dt.datetime.utcnow()).total_seconds())))
+        if self._paused:
+            logger.info("budget headroom available again; resuming")
+            self._paused = False
+        if frac > self.slow_at:
+            try:
+                await asyncio.sleep(self.max_delay * (frac - self.slow_at) / (1.0 - self.slow_at))
+            except BaseException:
+                # Cancelled while throttled: the call never happens, so it must not stay reserved
+                self.in_flight -= 1
+                raise
+
+    def release(self, records: list[Usage], prices: Optional[dict[str, dict[str, float]]] = None) -> None:
+        self.in_flight -= 1
+        if not records:
+            return
+        usd = sum(u.cost(prices) for u in records)
+        tokens = sum(u.total_tokens for u in records)
+        self._spent_usd += usd
+        self._spent_tokens += tokens
+        # Moving average of one call's cost, used to reserve headroom for in-flight calls
+        self._avg_usd = usd if not self._avg_usd else 0.8 * self._avg_usd + 0.2 * usd
+        self._avg_tokens = tokens if not self._avg_tokens else 0.8 * self._avg_tokens + 0.2 * tokens
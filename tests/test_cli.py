@@ -1,7 +1,7 @@
 import os
 from click.testing import CliRunner
 from forge.cli import main
-from forge import storage
+from forge import daemon, storage
 import asyncio
 
 
@@ -16,6 +16,8 @@ def test_queue_add_and_list(tmp_path, monkeypatch):
     # Use temp DB
     monkeypatch.setenv("FORGE_CONFIG", str(tmp_path / "config.yaml"))
     storage.DB_PATH = tmp_path / "forge.db"  # type: ignore
+    # Never talk to a daemon (and its DB) that happens to be running in the cwd
+    monkeypatch.setattr(daemon, "SOCKET_PATH", tmp_path / "forge.sock")
     asyncio.run(storage.init_db())
 
     runner = CliRunner()
@@ -25,3 +27,17 @@ def test_queue_add_and_list(tmp_path, monkeypatch):
     res2 = runner.invoke(main, ["queue", "list", "--limit", "5"])
     assert res2.exit_code == 0
     assert "hello-world-task" in res2.output
+
+
+def test_queue_add_does_not_fall_back_after_unconfirmed_send(tmp_path, monkeypatch):
+    storage.DB_PATH = tmp_path / "forge.db"  # type: ignore
+    asyncio.run(storage.init_db())
+
+    def no_reply(cmd, *args, **kwargs):
+        raise daemon.DaemonNoReply("daemon did not confirm 'enqueue'")
+
+    monkeypatch.setattr(daemon, "request", no_reply)
+    res = CliRunner().invoke(main, ["queue", "add", "job"])
+    assert res.exit_code != 0
+    assert "queue list" in res.output
+    assert asyncio.run(storage.list_tasks(5)) == []
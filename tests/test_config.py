@@ -0,0 +1,130 @@
+import asyncio
+import functools
+import os
+import time
+import yaml
+from forge import agent_manager, config, storage
+from forge.agent_manager import RunnerSettings
+from forge.providers import BaseProvider
+
+
+def _write(path, cfg, mtime):
+    path.write_text(yaml.safe_dump(cfg))
+    os.utime(path, (mtime, mtime))
+
+
+def test_load_config_is_cached_until_file_changes(tmp_path, monkeypatch):
+    path = tmp_path / "config.yaml"
+    monkeypatch.setattr(config, "CONFIG_PATH", path)
+    _write(path, {"model": "a"}, 1_000_000)
+    calls = []
+    real = yaml.safe_load
+    monkeypatch.setattr(config.yaml, "safe_load", lambda f: calls.append(1) or real(f))
+
+    first = config.load_config()
+    first["model"] = "mutated"
+    assert config.get_model() == "a"
+    assert len(calls) == 1
+
+    _write(path, {"model": "b"}, 1_000_001)
+    assert config.get_model() == "b"
+    assert len(calls) == 2
+
+
+def test_watch_config_applies_changed_runner_settings(tmp_path, monkeypatch):
+    path = tmp_path / "config.yaml"
+    monkeypatch.setattr(config, "CONFIG_PATH", path)
+    base = {"concurrency_limit": 4, "retry_policy": {"max_retries": 3, "delay_seconds": 5}}
+    _write(path, base, 1_000_000)
+    # CLI override of concurrency must survive edits to other keys
+    settings = RunnerSettings(concurrency=2, retries=3, retry_delay=5)
+    seen = {"cfg": config.load_config()}
+
+    def on_change(cfg):
+        settings.apply_config(seen["cfg"], cfg)
+        seen["cfg"] = cfg
+
+    async def go():
+        watcher = asyncio.create_task(config.watch_config(on_change, interval=0.01))
+        await asyncio.sleep(0.03)
+        _write(path, {**base, "retry_policy": {"max_retries": 1, "delay_seconds": 5}, "rate_limit": 10}, 1_000_001)
+        await asyncio.sleep(0.05)
+        assert (settings.concurrency, settings.retries, settings.rate_limit) == (2, 1, 10.0)
+        _write(path, {**seen["cfg"], "concurrency_limit": 8}, 1_000_002)
+        await asyncio.sleep(0.05)
+        watcher.cancel()
+
+    asyncio.run(go())
+    assert settings.concurrency == 8
+
+
+def test_watch_config_survives_a_failing_change(tmp_path, monkeypatch):
+    path = tmp_path / "config.yaml"
+    monkeypatch.setattr(config, "CONFIG_PATH", path)
+    _write(path, {"concurrency_limit": 4}, 1_000_000)
+    settings = RunnerSettings(concurrency=4)
+    seen = {"cfg": config.load_config()}
+
+    def on_change(cfg):
+        settings.apply_config(seen["cfg"], cfg)
+        seen["cfg"] = cfg
+
+    async def go():
+        watcher = asyncio.create_task(config.watch_config(on_change, interval=0.01))
+        await asyncio.sleep(0.03)
+        _write(path, {"concurrency_limit": "lots"}, 1_000_001)
+        await asyncio.sleep(0.05)
+        _write(path, {"concurrency_limit": 6}, 1_000_002)
+        await asyncio.sleep(0.05)
+        alive = not watcher.done()
+        watcher.cancel()
+        return alive
+
+    assert asyncio.run(go())
+    assert settings.concurrency == 6
+
+
+class CountingProvider(BaseProvider):
+    name = "counting"
+
+    def __init__(self):
+        self.active = 0
+        self.started: list[tuple[float, int]] = []
+
+    async def generate(self, system_prompt: str, user_prompt: str) -> str:
+        self.active += 1
+        self.started.append((time.monotonic(), self.active))
+        try:
+            await asyncio.sleep(0.1)
+        finally:
+            self.active -= 1
+        return "ok"
+
+
+def test_run_queue_resizes_workers_live(tmp_path, monkeypatch):
+    path = tmp_path / "config.yaml"
+    monkeypatch.setattr(config, "CONFIG_PATH", path)
+    monkeypatch.setattr(agent_manager, "_watch_config", functools.partial(config.watch_config, interval=0.01))
+    storage.DB_PATH = tmp_path / "forge.db"  # type: ignore
+    _write(path, {"concurrency_limit": 1}, 1_000_000)
+    provider = CountingProvider()
+
+    async def go():
+        await storage.init_db()
+        for i in range(16):
+            await storage.enqueue_task(f"t{i}")
+        runner = asyncio.create_task(agent_manager.run_queue(1, provider, watch_config=True))
+        await asyncio.sleep(0.05)
+        _write(path, {"concurrency_limit": 4}, 1_000_001)
+        await asyncio.sleep(0.3)
+        _write(path, {"concurrency_limit": 1}, 1_000_002)
+        scaled_down = time.monotonic()
+        await asyncio.wait_for(runner, timeout=5.0)
+        return scaled_down, await storage.list_tasks(100)
+
+    scaled_down, rows = asyncio.run(go())
+    assert max(active for _, active in provider.started) == 4
+    # Surplus workers finish their current task, then retire
+    settled = [active for ts, active in provider.started if ts > scaled_down + 0.15]
+    assert settled and max(settled) == 1
+    assert [r[2] for r in rows] == ["done"] * 16
@@ -0,0 +1,54 @@
+import asyncio
+import socket
+import subprocess
+import sys
+import threading
+import pytest
+from forge import daemon, storage
+
+HEAVY = ("anthropic", "prompt_toolkit", "rich", "aiosqlite", "yaml")
+
+
+def test_cli_import_does_not_load_heavy_modules():
+    code = f"import sys, forge.cli; print(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ""
+
+
+def test_daemon_serves_enqueue_list_stats(tmp_path):
+    storage.DB_PATH = tmp_path / "forge.db"  # type: ignore
+    sock = tmp_path / "forge.sock"
+    server = daemon.Daemon(socket_path=sock)
+    ready = threading.Event()
+
+    async def serve():
+        task = asyncio.create_task(server.serve())
+        while not sock.exists():
+            await asyncio.sleep(0.01)
+        ready.set()
+        await task
+
+    thread = threading.Thread(target=asyncio.run, args=(serve(),))
+    thread.start()
+    try:
+        assert ready.wait(5)
+        task_id = daemon.request("enqueue", sock, payload="via socket")["id"]
+        rows = daemon.request("list", sock, limit=5)["rows"]
+        stats = daemon.request("stats", sock)
+    finally:
+        daemon.request("stop", sock)
+        thread.join(5)
+    assert rows[0][:3] == [task_id, "via socket", "queued"]
+    assert stats["tasks"] == {"queued": 1}
+    assert not sock.exists()
+
+
+def test_hung_daemon_is_no_reply_not_unavailable(tmp_path):
+    sock_path = tmp_path / "hung.sock"
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+        # Accepts connections (via the backlog) but never answers
+        listener.bind(str(sock_path))
+        listener.listen(1)
+        # The request went out, so callers must not assume it was never applied
+        with pytest.raises(daemon.DaemonNoReply):
+            daemon.request("ping", sock_path, timeout=0.1)
@@ -0,0 +1,153 @@
+import asyncio
+import aiosqlite
+from forge import dag, storage
+from forge.agent_manager import run_queue
+from forge.providers import BaseProvider, EchoProvider
+
+
+async def _statuses() -> dict[int, str]:
+    return {r[0]: r[2] for r in await storage.list_tasks(1000)}
+
+
+async def _children(parent_id: int) -> list[int]:
+    return [r[0] for r in await storage.child_outputs(parent_id)]
+
+
+def test_join_runs_after_children_over_their_outputs(tmp_path):
+    storage.DB_PATH = tmp_path / "forge.db"  # type: ignore
+
+    async def go():
+        await storage.init_db()
+        join_id, child_ids = await dag.fan_out(["review a.py", "review b.py", "review c.py"], "summarize reviews")
+        blocked = (await _statuses())[join_id]
+        await run_queue(3, EchoProvider())
+        async with aiosqlite.connect(storage.DB_PATH) as db:
+            cur = await db.execute("SELECT id, status, output, updated_at FROM tasks ORDER BY id")
+            return join_id, child_ids, blocked, {r[0]: r[1:] for r in await cur.fetchall()}
+
+    join_id, child_ids, blocked, rows = asyncio.run(go())
+    assert blocked == "blocked"
+    assert all(rows[i][0] == "done" for i in (join_id, *child_ids))
+    join_output = rows[join_id][1]
+    assert "summarize reviews" in join_output
+    assert all(f"review {name}.py" in join_output for name in "abc")
+    assert rows[join_id][2] >= max(rows[i][2] for i in child_ids)
+
+
+def test_map_reduce_builds_bounded_tree(tmp_path):
+    storage.DB_PATH = tmp_path / "forge.db"  # type: ignore
+
+    async def go():
+        await storage.init_db()
+        root = await dag.map_reduce((f"chunk {i}" for i in range(10)), "map", "reduce", fanin=3, batch=4)
+        statuses = await _statuses()
+        # Walk the tree: every join has at most fanin inputs, every map is reachable from the root
+        maps, joins, frontier = [], [], [root]
+        while frontier:
+            node = frontier.pop()
+            kids = await _children(node)
+            if kids:
+                joins.append(node)
+                assert len(kids) <= 3
+                frontier.extend(kids)
+            else:
+                maps.append(node)
+        return statuses, maps, joins
+
+    statuses, maps, joins = asyncio.run(go())
+    assert len(maps) == 10 and all(statuses[m] == "queued" for m in maps)
+    assert all(statuses[j] == "blocked" for j in joins)
+    # No stray joins left outside the tree
+    assert len(statuses) == len(maps) + len(joins)
+
+
+def test_iter_chunks_respects_limit():
+    chunks = list(dag.iter_chunks(["aaaa\n", "bb\n", "c" * 12 + "\n"], 8))
+    assert all(len(c) <= 8 for c in chunks)
+    assert "".join(chunks) == "aaaa\nbb\n" + "c" * 12 + "\n"
+
+
+class FailingProvider(BaseProvider):
+    name = "failing"
+
+    async def generate(self, system_prompt: str, user_prompt: str) -> str:
+        if "boom" in user_prompt:
+            raise RuntimeError("boom")
+        return "ok"
+
+
+def test_failed_child_fails_join_chain(tmp_path):
+    storage.DB_PATH = tmp_path / "forge.db"  # type: ignore
+
+    async def go():
+        await storage.init_db()
+        root = await dag.map_reduce(["fine", "boom", "fine", "fine"], "map", "reduce", fanin=2)
+        await run_queue(2, FailingProvider())
+        return root, await _statuses()
+
+    root, statuses = asyncio.run(go())
+    assert statuses[root] == "failed"
+    assert list(statuses.values()).count("done") >= 3
+
+
+def test_interrupted_map_reduce_fails_what_it_enqueued(tmp_path):
+    storage.DB_PATH = tmp_path / "forge.db"  # type: ignore
+
+    def chunks():
+        for i in range(7):
+            yield f"chunk {i}"
+        raise OSError("read error")
+
+    async def go():
+        await storage.init_db()
+        try:
+            await dag.map_reduce(chunks(), "map", "reduce", fanin=3, batch=2)
+        except OSError:
+            pass
+        return await _statuses()
+
+    statuses = asyncio.run(go())
+    assert statuses and set(statuses.values()) == {"failed"}
+
+
+def test_sweep_fails_stale_unsealed_joins(tmp_path):
+    storage.DB_PATH = tmp_path / "forge.db"  # type: ignore
+
+    async def go():
+        await storage.init_db()
+        stale = await storage.create_join("reduce")
+        await storage.add_children(stale, ["a", "b"])
+        fresh = await storage.create_join("reduce")
+        async with aiosqlite.connect(storage.DB_PATH) as db:
+            await db.execute("UPDATE tasks SET updated_at='2000-01-01T00:00:00' WHERE id=?", (stale,))
+            await db.commit()
+        swept = await storage.sweep_orphaned_joins(60)
+        return stale, fresh, swept, await _statuses()
+
+    stale, fresh, swept, statuses = asyncio.run(go())
+    assert swept == 3
+    assert statuses[stale] == "failed" and statuses[fresh] == "pending"
+    assert list(statuses.values()).count("failed") == 3
+
+
+def test_only_joins_fetch_child_outputs(tmp_path, monkeypatch):
+    storage.DB_PATH = tmp_path / "forge.db"  # type: ignore
+    fetched = []
+    real = storage.child_outputs
+
+    async def counting(parent_id):
+        fetched.append(parent_id)
+        return await real(parent_id)
+
+    monkeypatch.setattr(storage, "child_outputs", counting)
+
+    async def go():
+        await storage.init_db()
+        for i in range(5):
+            await storage.enqueue_task(f"plain {i}")
+        join_id, _ = await dag.fan_out(["x", "y"], "merge")
+        await run_queue(2, EchoProvider())
+        return join_id
+
+    join_id = asyncio.run(go())
+    assert fetched == [join_id]
@@ -0,0 +1,183 @@
+import asyncio
+import time
+import pytest
+from forge.providers import BaseProvider, CircuitBreaker, FailoverProvider, HedgedProvider
+
+
+class SlowFirstProvider(BaseProvider):
+    name = "slow-first"
+
+    def __init__(self):
+        self.calls = 0
+        self.cancelled = 0
+
+    async def generate(self, system_prompt: str, user_prompt: str) -> str:
+        self.calls += 1
+        call = self.calls
+        try:
+            # Every 25th call stalls; its hedge returns immediately
+            await asyncio.sleep(5.0 if call % 25 == 0 else 0.001)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return f"out-{call}"
+
+
+def test_hedged_provider_races_straggler_within_budget():
+    inner = SlowFirstProvider()
+    hedged = HedgedProvider(inner, percentile=90, budget=0.05, min_samples=10)
+
+    async def go():
+        return [await hedged.generate("s", f"u{i}") for i in range(50)]
+
+    outs = asyncio.run(asyncio.wait_for(go(), timeout=3.0))
+    assert len(outs) == 50
+    assert hedged.hedges == 2
+    assert inner.cancelled == 2
+    assert hedged.hedges <= hedged.calls * hedged.budget
+
+
+class Overloaded(Exception):
+    status_code = 529
+
+
+class FlakyProvider(BaseProvider):
+    name = "flaky"
+
+    def __init__(self, fail: bool):
+        self.fail = fail
+        self.calls = 0
+
+    async def generate(self, system_prompt: str, user_prompt: str) -> str:
+        self.calls += 1
+        if self.fail:
+            raise Overloaded("overloaded")
+        return "ok"
+
+
+def test_failover_opens_breaker_and_half_opens_to_recover():
+    primary, backup = FlakyProvider(fail=True), FlakyProvider(fail=False)
+    chain = FailoverProvider([("sonnet", primary), ("haiku", backup)], failure_threshold=2, reset_seconds=0.05)
+
+    async def go(n: int):
+        return [await chain.generate("s", "u") for _ in range(n)]
+
+    assert asyncio.run(go(5)) == ["ok"] * 5
+    # Breaker opened after two errors; the rest went straight to the backup
+    assert primary.calls == 2
+    assert chain.chain[0][2].state == CircuitBreaker.OPEN
+
+    primary.fail = False
+    time.sleep(0.06)
+    assert chain.chain[0][2].state == CircuitBreaker.HALF_OPEN
+    asyncio.run(go(1))
+    assert primary.calls == 3
+    assert chain.chain[0][2].state == CircuitBreaker.CLOSED
+
+
+def test_hedged_provider_cancels_inner_call_when_caller_is_cancelled():
+    inner = SlowFirstProvider()
+    hedged = HedgedProvider(inner, percentile=90, min_samples=1)
+    hedged._latencies.append(1.0)
+
+    async def go():
+        inner.calls = 24  # next call is a 5s straggler
+        call = asyncio.ensure_future(hedged.generate("s", "u"))
+        await asyncio.sleep(0.05)
+        call.cancel()
+        await asyncio.gather(call, return_exceptions=True)
+        await asyncio.sleep(0.01)
+        # Checked before asyncio.run tears down leftover tasks
+        return inner.cancelled
+
+    assert asyncio.run(go()) == 1
+
+
+def test_hedge_win_records_straggler_lower_bound():
+    inner = SlowFirstProvider()
+    hedged = HedgedProvider(inner, percentile=50, budget=1.0, min_samples=1)
+    hedged._latencies.append(0.05)
+    inner.calls = 24
+
+    asyncio.run(hedged.generate("s", "u"))
+    assert hedged.hedges == 1
+    # Not the hedge's own ~1ms latency
+    assert hedged._latencies[-1] >= 0.05
+
+
+class StallingProvider(BaseProvider):
+    name = "stalling"
+
+    def __init__(self):
+        self.stall = True
+
+    async def generate(self, system_prompt: str, user_prompt: str) -> str:
+        if self.stall:
+            await asyncio.sleep(5.0)
+        return "primary"
+
+
+def test_cancelled_half_open_probe_does_not_wedge_breaker():
+    primary = StallingProvider()
+    chain = FailoverProvider([("sonnet", primary), ("haiku", FlakyProvider(fail=False))], reset_seconds=0.0)
+    breaker = chain.chain[0][2]
+    breaker._state, breaker.opened_at = CircuitBreaker.OPEN, 0.0
+
+    async def go():
+        probe = asyncio.ensure_future(chain.generate("s", "u"))
+        await asyncio.sleep(0.05)
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+        primary.stall = False
+        return await chain.generate("s", "u")
+
+    assert asyncio.run(go()) == "primary"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_slow_half_open_probe_times_out_as_failure():
+    primary = StallingProvider()
+    chain = FailoverProvider([("sonnet", primary), ("haiku", FlakyProvider(fail=False))], reset_seconds=10.0, probe_timeout=0.05)
+    breaker = chain.chain[0][2]
+    breaker._state, breaker.opened_at = CircuitBreaker.OPEN, time.monotonic() - 10.0
+
+    assert asyncio.run(chain.generate("s", "u")) == "ok"
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+class BadRequest(Exception):
+    status_code = 400
+
+
+class RejectingProvider(BaseProvider):
+    name = "rejecting"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def generate(self, system_prompt: str, user_prompt: str) -> str:
+        self.calls += 1
+        raise BadRequest("prompt is too long")
+
+
+def test_bad_requests_do_not_trip_breaker_or_fail_over():
+    primary, backup = RejectingProvider(), FlakyProvider(fail=False)
+    chain = FailoverProvider([("sonnet", primary), ("haiku", backup)], failure_threshold=2)
+
+    async def go():
+        for _ in range(5):
+            with pytest.raises(BadRequest):
+                await chain.generate("s", "u")
+
+    asyncio.run(go())
+    assert primary.calls == 5 and backup.calls == 0
+    assert chain.chain[0][2].state == CircuitBreaker.CLOSED
+
+
+def test_late_success_does_not_close_open_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    # A call that started before the breaker opened finishes fine
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.OPEN
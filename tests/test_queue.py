@@ -0,0 +1,28 @@
+import asyncio
+from forge import storage
+from forge.queue import TaskQueue, prefetch
+
+
+def test_prefetch_stops_claiming_when_buffer_full(tmp_path):
+    storage.DB_PATH = tmp_path / "forge.db"  # type: ignore
+
+    async def go():
+        await storage.init_db()
+        for i in range(10):
+            await storage.enqueue_task(f"t{i}")
+        buffer = TaskQueue(maxsize=3)
+        fetcher = asyncio.create_task(prefetch(buffer))
+        await asyncio.sleep(0.1)
+        claimed_while_full = [r[2] for r in await storage.list_tasks(10)].count("in_progress")
+
+        served = []
+        while (item := await buffer.get()) is not None:
+            served.append(item[0])
+            buffer.task_done()
+        await fetcher
+        return claimed_while_full, served, buffer.metrics()
+
+    claimed_while_full, served, metrics = asyncio.run(go())
+    assert claimed_while_full == 3
+    assert served == list(range(1, 11))
+    assert metrics["served"] == 10 and metrics["depth"] == 0 and metrics["fill_ratio"] == 0
@@ -0,0 +1,41 @@
+import asyncio
+import datetime as dt
+from forge import storage
+from forge.cron import Cron
+from forge.scheduler import ScheduleHeap
+
+
+def test_cron_next_after():
+    start = dt.datetime(2026, 10, 19, 10, 7, 30)  # a Monday
+    assert Cron("*/5 * * * *").next_after(start) == dt.datetime(2026, 10, 19, 10, 10)
+    assert Cron("0 9 * * 1-5").next_after(start) == dt.datetime(2026, 10, 20, 9, 0)
+    assert Cron("0 0 * * 7").next_after(start) == dt.datetime(2026, 10, 25, 0, 0)
+
+
+def test_heap_promotes_once_and_rearms_cron(tmp_path):
+    storage.DB_PATH = tmp_path / "forge.db"  # type: ignore
+
+    async def go():
+        await storage.init_db()
+        past = (dt.datetime.utcnow() - dt.timedelta(minutes=1)).isoformat()
+        await storage.add_schedule("one-shot", past)
+        await storage.add_schedule("recurring", past, "*/5 * * * *")
+        version = await storage.schedules_version()
+
+        heap = ScheduleHeap()
+        await heap.load()
+        changed = await heap.fire_due(dt.datetime.utcnow())
+        # A second scheduler holding the stale run_at must not double-enqueue
+        stale = ScheduleHeap()
+        stale._heap = [(dt.datetime.min, 1, past, None)]
+        await stale.fire_due(dt.datetime.utcnow())
+
+        rows = await storage.list_tasks(10)
+        pending = await storage.pending_schedules()
+        return changed, version, await storage.schedules_version(), rows, pending, len(heap)
+
+    changed, before, after, rows, pending, remaining = asyncio.run(go())
+    assert changed == 2 and after == before + 2
+    assert sorted(r[1] for r in rows) == ["one-shot", "recurring"]
+    assert [p[1] for p in pending] == ["recurring"]
+    assert remaining == 1
@@ -0,0 +1,72 @@
+import asyncio
+from forge import storage
+from forge.agent_manager import run_queue
+from forge.events import TaskEvent, bus
+from forge.models import make_provider
+from forge.studio import StudioState
+
+
+def test_runner_events_drive_studio_state(tmp_path):
+    storage.DB_PATH = tmp_path / "forge.db"  # type: ignore
+    _, provider = make_provider("debug-echo")
+
+    async def go():
+        await storage.init_db()
+        for i in range(3):
+            await storage.enqueue_task(f"task {i}")
+        events = bus.subscribe()
+        try:
+            await run_queue(2, provider, stream_output=True)
+        finally:
+            bus.unsubscribe(events)
+        state = StudioState()
+        while not events.empty():
+            state.apply(events.get_nowait())
+        return state
+
+    state = asyncio.run(go())
+    assert [s for s, _ in state.tasks.values()] == ["done"] * 3
+    assert state.workers == {0: "stopped", 1: "stopped"}
+    assert "[ECHO]" in state.outputs[state.selected()]
+    assert sum(state.completions) == 3
+
+
+def test_virtualized_rows_only_cover_window():
+    state = StudioState()
+    for i in range(1, 100_001):
+        state.upsert_task(i, "queued", f"p{i}")
+    state.move(50_000)
+    rows = state.visible_rows(20)
+    assert len(rows) == 20
+    selected = [tid for sel, tid, _, _ in rows if sel]
+    assert selected == [50_000]
+
+
+def test_output_buffers_are_bounded_but_keep_selected_task():
+    state = StudioState(output_tasks=3)
+    for tid in range(1, 11):
+        state.apply(TaskEvent("task", task_id=tid, status="in_progress", text=f"task {tid}"))
+    state.move(9)  # select the oldest task
+    assert state.selected() == 1
+    for tid in range(1, 11):
+        state.apply(TaskEvent("output", task_id=tid, text=f"out {tid}"))
+    assert len(state.outputs) == 3
+    assert set(state.outputs) == {1, 9, 10}
+
+
+def test_studio_keeps_only_payload_previews(tmp_path):
+    storage.DB_PATH = tmp_path / "forge.db"  # type: ignore
+    big = "summarize chunk\n" + "x" * 50_000
+
+    async def go():
+        await storage.init_db()
+        await storage.enqueue_task(big)
+        return await storage.list_task_previews(10, 200)
+
+    (task_id, snap, status), = asyncio.run(go())
+    assert len(snap) == 200
+    state = StudioState()
+    state.upsert_task(task_id, status, snap)
+    state.apply(TaskEvent("task", task_id=2, status="in_progress", text="y" * 10_000))
+    assert state.tasks[task_id][1] == "summarize chunk"
+    assert len(state.tasks[2][1]) == 200
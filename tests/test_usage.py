@@ -0,0 +1,103 @@
+import asyncio
+import pytest
+from forge import storage
+from forge.agent_manager import run_queue
+from forge.providers import BaseProvider
+from forge.usage import BudgetGuard, Usage, record
+
+
+class MeteredProvider(BaseProvider):
+    name = "metered"
+
+    async def generate(self, system_prompt: str, user_prompt: str) -> str:
+        record(Usage("claude-3.5-sonnet", input_tokens=1000, output_tokens=200, cache_read_tokens=500, latency_ms=12))
+        return "ok"
+
+
+def test_usage_recorded_per_task_and_aggregated(tmp_path):
+    storage.DB_PATH = tmp_path / "forge.db"  # type: ignore
+
+    async def go():
+        await storage.init_db()
+        await storage.enqueue_task("a", queue="reviews")
+        await storage.enqueue_task("b", queue="reviews")
+        await storage.enqueue_task("c")
+        await run_queue(2, MeteredProvider())
+        return await storage.usage_report("model"), await storage.usage_report("queue"), await storage.usage_totals("")
+
+    by_model, by_queue, (tokens, cost) = asyncio.run(go())
+    assert by_model[0][:7] == ("claude-3.5-sonnet", 3, 3, 3000, 600, 1500, 0)
+    assert [(r[0], r[1]) for r in by_queue] == [("default", 1), ("reviews", 2)]
+    assert tokens == 5100
+    # 3 x (1000 * $3 + 200 * $15 + 500 * $0.30) per million
+    assert cost == pytest.approx(3 * 6150 / 1_000_000)
+
+
+def test_budget_guard_pauses_at_limit(tmp_path):
+    storage.DB_PATH = tmp_path / "forge.db"  # type: ignore
+
+    async def go():
+        await storage.init_db()
+        guard = BudgetGuard(max_tokens=1000, slow_at=0.5, max_delay=0.05)
+        await guard.acquire()  # nothing spent yet: passes immediately
+        guard.release([Usage("x", input_tokens=700)])
+        await guard.acquire()  # 70% spent: throttled, not paused
+        guard.release([Usage("x", input_tokens=400)])
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(guard.acquire(), timeout=0.2)
+
+    asyncio.run(go())
+
+
+def test_budget_guard_does_not_leak_cancelled_reservations(tmp_path, monkeypatch):
+    storage.DB_PATH = tmp_path / "forge.db"  # type: ignore
+    queries = []
+    real_totals = storage.usage_totals
+
+    async def counting_totals(since_iso):
+        queries.append(since_iso)
+        return await real_totals(since_iso)
+
+    monkeypatch.setattr(storage, "usage_totals", counting_totals)
+
+    async def go():
+        await storage.init_db()
+        guard = BudgetGuard(max_tokens=1000, slow_at=0.5, max_delay=5.0)
+        await asyncio.gather(*(guard.acquire() for _ in range(10)))
+        assert len(queries) == 1
+        guard.release([Usage("x", input_tokens=700)])
+        for _ in range(9):
+            guard.release([])
+        # Throttled (70% spent); cancelling mid-delay must give the reservation back
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(guard.acquire(), timeout=0.05)
+        return guard.in_flight
+
+    assert asyncio.run(go()) == 0
+
+
+def test_usage_write_failure_does_not_fail_or_retry_task(tmp_path, monkeypatch):
+    storage.DB_PATH = tmp_path / "forge.db"  # type: ignore
+    provider = MeteredProvider()
+    calls = []
+    real_generate = provider.generate
+
+    async def counted(system_prompt, user_prompt):
+        calls.append(user_prompt)
+        return await real_generate(system_prompt, user_prompt)
+
+    async def locked(*args, **kwargs):
+        raise storage.aiosqlite.OperationalError("database is locked")
+
+    monkeypatch.setattr(provider, "generate", counted)
+    monkeypatch.setattr(storage, "record_usage", locked)
+
+    async def go():
+        await storage.init_db()
+        await storage.enqueue_task("job")
+        await run_queue(1, provider, retries=2, retry_delay=0)
+        return await storage.list_tasks(5)
+
+    rows = asyncio.run(go())
+    assert rows[0][2] == "done"
+    assert calls == ["job"]